@@ -18,95 +18,100 @@ from pathlib import Path
 from typing import List, Dict, Tuple, Optional
 import re
 import sys
+from collections import Counter, defaultdict
+from pandas.api.types import union_categoricals
+import multiprocessing
+import threading
 
-# 将项目根目录添加到Python路径，以便导入excel_utils
-project_root = Path(__file__).resolve().parent.parent
-sys.path.append(str(project_root))
+# 作为脚本直接运行时，将项目根目录添加到Python路径以便导入excel_utils；作为包导入时不修改sys.path
+if __name__ == "__main__":
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 from excel_utils import (
-    read_excel_fast, 
-    write_excel_fast, 
+    read_sheet_rows,
+    write_excel_streaming,
     scan_excel_files, 
     extract_batch_id, 
-    generate_lot_based_filename
+    generate_lot_based_filename,
+    map_files_parallel,
+    FileResultCache,
+    CancellableMixin,
+    get_performance_stats
 )
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('dc_cleaner.log', mode='w', encoding='utf-8'), # 每次运行时覆盖日志文件
-        logging.StreamHandler()
-    ]
-)
+# 配置日志（仅主进程；并行提取的工作进程经由队列把日志交回主进程，避免重复覆盖日志文件）
+if multiprocessing.parent_process() is None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('dc_cleaner.log', mode='w', encoding='utf-8'), # 每次运行时覆盖日志文件
+            logging.StreamHandler()
+        ]
+    )
 logger = logging.getLogger(__name__)
 
-class DCDataCleaner:
+# 单文件提取结果的缓存版本号，修改extract_dc_data的输出时需要递增
+CACHE_VERSION = 2
+
+# 表头区域行数上限：参数行(第2行)、测试条件行(第5/6行)、单位行(第7行)及Test No.行(第19行)均位于其中
+HEADER_SCAN_ROWS = 30
+
+# 需要附加测试条件的参数及测试条件所在行：IDSS/ISGS取第5行，LRDON取第6行
+_CONDITION_ROWS = {'IDSS': 4, 'ISGS': 4, 'LRDON': 5}
+
+# 测试条件中的数值部分，如"40.0V" -> "40.0"
+_NUM_RE = re.compile(r'(\d+\.?\d*)')
+
+
+def _stripped_row(row: tuple) -> List[str]:
+    """将一行单元格转换为去除首尾空白的字符串，缺失值转为空字符串"""
+    return ['' if pd.isna(value) else str(value).strip() for value in row]
+
+
+def _parse_condition_value(condition_value) -> Optional[str]:
+    """从测试条件单元格中提取数值部分，如"40.0V" -> "40.0"，为空或无数值时返回None"""
+    if pd.isna(condition_value):
+        return None
+    
+    condition_str = str(condition_value).strip()
+    match = _NUM_RE.search(condition_str)
+    if match:
+        return match.group(1)
+    
+    logger.warning(f"无法从测试条件中提取数值: '{condition_str}'")
+    return None
+
+
+class DCDataCleaner(CancellableMixin):
     """DC数据清洗器主类"""
     
-    def __init__(self, input_dir: str = "../ASEData/DC", output_dir: str = "../output"):
+    def __init__(self, input_dir: str = "../ASEData/DC", output_dir: str = "../output",
+                 max_workers: Optional[int] = None, cache_dir: Optional[str] = None,
+                 cancel_event: Optional[threading.Event] = None):
         """
         初始化DC数据清洗器
         
         Args:
             input_dir: 输入目录路径
             output_dir: 输出目录路径
+            max_workers: 并行提取文件的最大进程数，None表示使用CPU核心数，1表示串行
+            cache_dir: 单文件提取结果的缓存目录，None表示不使用缓存
+            cancel_event: 可选的取消事件（如GUI的取消操作），设置后在文件之间停止处理
         """
         self.input_dir = Path(input_dir)
         self.output_dir = Path(output_dir)
+        self.max_workers = max_workers
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.cancel_event = cancel_event
         self.ensure_output_dir()
-        
+    
     def ensure_output_dir(self):
         """确保输出目录存在"""
         if not self.output_dir.exists():
             self.output_dir.mkdir(parents=True, exist_ok=True)
             logger.info(f"创建输出目录: {self.output_dir}")
     
-    def extract_test_condition_value(self, df: pd.DataFrame, param_col: int, row_index: int = 4) -> Optional[str]:
-        """
-        提取参数的测试条件数值
-        
-        Args:
-            df: Excel数据表
-            param_col: 参数所在列
-            row_index: 测试条件所在行索引（默认为4，即第5行）
-            
-        Returns:
-            测试条件数值字符串，如"40.0"，失败返回None
-        """
-        try:
-            # 检查行数是否足够
-            if df.shape[0] < row_index + 1:
-                logger.warning(f"文件行数不足，无法获取第{row_index + 1}行测试条件")
-                return None
-            
-            # 使用 .iat 进行快速单点访问
-            condition_value = df.iat[row_index, param_col]
-            if pd.isna(condition_value):
-                logger.debug(f"参数列{param_col}在第{row_index + 1}行的测试条件为空")
-                return None
-            
-            condition_str = str(condition_value).strip()
-            logger.debug(f"第{row_index + 1}行测试条件原始值: '{condition_str}'")
-            
-            # 使用正则表达式提取数值部分
-            match = re.search(r'(\d+\.?\d*)', condition_str)
-            if match:
-                numeric_value = match.group(1)
-                logger.debug(f"提取到测试条件数值: '{numeric_value}'")
-                return numeric_value
-            else:
-                logger.warning(f"无法从测试条件中提取数值: '{condition_str}'")
-                return None
-                
-        except IndexError:
-            logger.warning(f"参数列{param_col}超出第{row_index + 1}行范围")
-            return None
-        except Exception as e:
-            logger.error(f"提取第{row_index + 1}行测试条件时出错: {str(e)}")
-            return None
-
     def extract_dc_data(self, file_path: Path) -> Optional[pd.DataFrame]:
         """
         从单个xlsx文件中高效提取DC测试数据（向量化版本）
@@ -120,64 +125,63 @@ class DCDataCleaner:
         logger.info(f"开始处理文件: {file_path.name}")
         
         try:
-            # 使用excel_utils中的快速读取函数
-            df = read_excel_fast(file_path, header=None)
-            logger.debug(f"文件读取成功，形状: {df.shape}")
+            # 以只读方式读取原始行，一次性构建DataFrame，跳过pd.read_excel的解析开销
+            rows = read_sheet_rows(file_path)
+            logger.debug("文件读取成功，行数: %d", len(rows))
             
             # 基础校验
-            if df.shape[0] < 7: # 至少需要7行才能获取参数和单位
+            if len(rows) < 7: # 至少需要7行才能获取参数和单位
                 logger.error(f"文件 {file_path.name} 行数不足 (小于7行)，跳过处理。")
                 return None
             
             # 使用excel_utils中的批次提取函数
             lot_id = extract_batch_id(file_path.name)
             
+            # 表头解析直接在原始行元组上进行，不构建DataFrame
+            header_rows = rows[:HEADER_SCAN_ROWS]
+            
             # 1. 定位第1行的CONT列和参数列
-            row1 = df.iloc[1]
+            row1 = _stripped_row(header_rows[1])
             
             # 快速定位CONT列
-            cont_search = row1.astype(str).str.strip() == 'CONT'
-            if not cont_search.any():
+            cont_col = next((i for i, value in enumerate(row1) if value == 'CONT'), None)
+            if cont_col is None:
                 logger.error(f"文件 {file_path.name} 未找到CONT列")
                 return None
-            cont_col = cont_search.idxmax()
-            logger.debug(f"CONT列位置: {cont_col}")
+            logger.debug("CONT列位置: %d", cont_col)
             
-            # 2. 提取CONT右边的所有参数
-            test_params = []
-            for i in range(cont_col + 1, len(row1)):
-                val = row1.iloc[i]
-                param_name = str(val).strip()
-                if not pd.isna(val) and param_name and param_name != 'SAME':
-                    test_params.append((i, param_name))
+            # 2. 提取CONT右边的所有参数（排除空单元格和SAME）
+            test_params = [
+                (col, param) for col, param in enumerate(row1[cont_col + 1:], start=cont_col + 1)
+                if param and param != 'SAME'
+            ]
             
-            logger.debug(f"找到 {len(test_params)} 个测试参数")
+            logger.debug("找到 %d 个测试参数", len(test_params))
             
             # 3. 获取第6行的单位信息
-            row6 = df.iloc[6]
+            units = _stripped_row(header_rows[6])
             
             # 4. 参数-单位匹配与增强（包含相邻ISGS检测）
             param_unit_pairs = []
             
-            # 首先进行基础参数增强
-            enhanced_params = []
-            for i, (col, param) in enumerate(test_params):
-                unit_val = row6.iloc[col] if col < len(row6) else None
-                unit_name = str(unit_val).strip() if not pd.isna(unit_val) and str(unit_val).strip() else None
-                
-                enhanced_param = param
-                if param.upper() in ['IDSS', 'ISGS']:
-                    test_condition = self.extract_test_condition_value(df, col, row_index=4)
-                    if test_condition:
-                        enhanced_param = f"{param}{test_condition}"
-                        logger.debug(f"{param}参数增强: {param} -> {enhanced_param}")
-                elif param.upper() == 'LRDON':
-                    test_condition = self.extract_test_condition_value(df, col, row_index=5)
-                    if test_condition:
-                        enhanced_param = f"{param}{test_condition}"
-                        logger.debug(f"{param}参数增强: {param} -> {enhanced_param}")
-                
-                enhanced_params.append((col, enhanced_param, unit_name))
+            # 首先为所有参数匹配单位，再只对需要附加测试条件的少数参数进行增强
+            enhanced_params = [
+                (col, param, (units[col] or None) if col < len(units) else None)
+                for col, param in test_params
+            ]
+            condition_targets = [
+                i for i, (_, param) in enumerate(test_params) if param.upper() in _CONDITION_ROWS
+            ]
+            for i in condition_targets:
+                col, param, unit_name = enhanced_params[i]
+                condition_row = header_rows[_CONDITION_ROWS[param.upper()]]
+                test_condition = _parse_condition_value(
+                    condition_row[col] if col < len(condition_row) else None
+                )
+                if test_condition:
+                    enhanced_param = f"{param}{test_condition}"
+                    enhanced_params[i] = (col, enhanced_param, unit_name)
+                    logger.debug("%s参数增强: %s -> %s", param, param, enhanced_param)
             
             # 检测相邻的ISGS参数并处理IGSS转换
             for i, (col, param, unit) in enumerate(enhanced_params):
@@ -201,17 +205,16 @@ class DCDataCleaner:
                 param_unit_pairs.append((col, param, unit))
             
             # 5. 构建最终参数列表（检查是否还有重复）
-            from collections import Counter
-            param_names = [pair[1] for pair in param_unit_pairs]
-            param_counts = Counter(param_names)
-            param_counters = {}
+            param_counts = Counter(param for _, param, _ in param_unit_pairs)
+            param_counters = defaultdict(int)
             final_params = []
+            renamed_params = []
             
             for col, param, unit in param_unit_pairs:
                 # 如果参数仍然重复，添加位置区分
                 if param_counts[param] > 1:
-                    count = param_counters.get(param, 0) + 1
-                    param_counters[param] = count
+                    param_counters[param] += 1
+                    count = param_counters[param]
 
                     # 对于IGSS/ISGS，保持旧的命名方式，因为它们有自己的特殊处理逻辑
                     if param.upper().startswith('IGSS') or param.upper().startswith('ISGS'):
@@ -222,40 +225,63 @@ class DCDataCleaner:
                         new_param_name = f"{param}{count}"
                         final_param_name = f"{new_param_name}({unit})" if unit else new_param_name
                     
-                    logger.warning(f"仍有重复参数: {param} -> {final_param_name}")
+                    renamed_params.append(f"{param} -> {final_param_name}")
                 else:
                     # 没有重复的参数
                     final_param_name = f"{param}({unit})" if unit else param
                 
                 final_params.append((col, final_param_name))
-                logger.debug(f"最终参数: 列{col} -> {final_param_name}")
+                logger.debug("最终参数: 列%d -> %s", col, final_param_name)
             
-            logger.debug(f"最终参数列表: {[param[1] for param in final_params]}")
+            # 重复参数的编号结果汇总为一条警告，而不是每个参数一条
+            if renamed_params:
+                logger.warning(f"文件 {file_path.name} 仍有重复参数: {', '.join(renamed_params)}")
             
-            # 6. 快速定位Test No.行
-            test_no_loc = np.where(df.map(lambda x: isinstance(x, str) and "Test No" in x))
-            if len(test_no_loc[0]) == 0:
-                logger.error(f"文件 {file_path.name} 未找到'Test No.'行")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("最终参数列表: %s", [param[1] for param in final_params])
+
+            # 编号后仍可能与已有参数重名（如VTH, VTH, VTH1 -> VTH1(V), VTH2(V), VTH1(V)），
+            # 按列名构建结果时后者会覆盖前者，因此直接报错跳过该文件
+            duplicate_names = [name for name, n in Counter(name for _, name in final_params).items() if n > 1]
+            if duplicate_names:
+                logger.error(f"文件 {file_path.name} 参数重命名后列名冲突: {', '.join(duplicate_names)}")
+                return None
+
+            # 6. 在表头区域内定位Test No.行
+            test_no_row = next(
+                (i for i, row in enumerate(header_rows)
+                 if any(isinstance(value, str) and 'Test No' in value for value in row)),
+                None
+            )
+            if test_no_row is None:
+                logger.error(f"文件 {file_path.name} 前{HEADER_SCAN_ROWS}行内未找到'Test No.'行")
                 return None
             
-            test_no_row = test_no_loc[0][0]
             data_start_row = test_no_row + 1
-            logger.debug(f"数据起始行: {data_start_row}")
+            logger.debug("数据起始行: %d", data_start_row)
 
-            if data_start_row >= df.shape[0]:
+            if data_start_row >= len(rows):
                 logger.warning(f"文件 {file_path.name} 没有找到有效数据行。")
                 return pd.DataFrame()
             
-            # 7. 向量化提取测试数据
-            extract_cols = [p[0] for p in final_params]
-            new_col_names = [p[1] for p in final_params]
+            # 7. 只提取数据区中参数所在的列
+            if not final_params:
+                logger.error(f"文件 {file_path.name} 未找到任何测试参数")
+                return None
             
-            # 一次性提取所有数据
-            result_df = df.iloc[data_start_row:, extract_cols].copy()
-            result_df.columns = new_col_names
-
-            # 插入lot_ID列
-            result_df.insert(0, 'lot_ID', lot_id)
+            # 按列构建结果（lot_ID列在最前），未使用的列不会进入DataFrame
+            data_rows = rows[data_start_row:]
+            # lot_ID整列取值相同，用只含一个类别的分类类型存储（每行1字节编码）
+            columns = {
+                'lot_ID': pd.Categorical.from_codes(np.zeros(len(data_rows), dtype=np.int8),
+                                                    categories=[lot_id])
+            }
+            for col, name in final_params:
+                columns[name] = [row[col] for row in data_rows]
+            result_df = pd.DataFrame(columns)
+            
+            # 原始行和中间列表已复制进DataFrame，及早释放以降低峰值内存
+            del rows, header_rows, data_rows, columns
 
             # 将所有数据列转换为数值，无效值转为NaN（只转换实际存在的列）
             for col in result_df.columns:
@@ -283,7 +309,7 @@ class DCDataCleaner:
         合并所有文件的DC数据
         
         Args:
-            data_frames: 多个DataFrame
+            data_frames: 多个DataFrame（合并过程中会被逐个取出，以尽早释放原始数据框）
             
         Returns:
             统一的DataFrame
@@ -295,8 +321,22 @@ class DCDataCleaner:
             return pd.DataFrame()
         
         try:
+            # 按首次出现顺序求列的并集，预先对齐各数据框，concat时无需再重新对齐
+            all_cols = list(dict.fromkeys(col for df in data_frames for col in df.columns))
+            
+            # 统一各数据框lot_ID的类别，concat后仍保持分类类型而不会退化为object
+            lot_categories = union_categoricals([df['lot_ID'] for df in data_frames]).categories
+            
+            aligned_frames = []
+            while data_frames:
+                df = data_frames.pop(0)
+                if list(df.columns) != all_cols:
+                    df = df.reindex(columns=all_cols)
+                df['lot_ID'] = df['lot_ID'].cat.set_categories(lot_categories)
+                aligned_frames.append(df)
+            
             # 使用 sort=False 提高性能
-            merged_df = pd.concat(data_frames, ignore_index=True, sort=False)
+            merged_df = pd.concat(aligned_frames, ignore_index=True, sort=False)
             logger.info(f"数据合并完成，总行数: {len(merged_df)}")
             return merged_df
             
@@ -321,17 +361,18 @@ class DCDataCleaner:
             return df
         
         try:
-            # 先过滤，再重置索引
-            df.dropna(subset=['lot_ID'], inplace=True)
-            df.reset_index(drop=True, inplace=True)
-            df.insert(0, 'NUM', range(1, len(df) + 1))
-            
-            df['lot_ID'] = df['lot_ID'].astype(str)
-            
-            # 重新排序列
-            cols = ['NUM', 'lot_ID']
-            other_cols = [col for col in df.columns if col not in cols]
-            df = df[cols + other_cols]
+            # 只在确有缺失批次时才过滤，避免无谓的整表复制
+            mask = df['lot_ID'].notna().to_numpy()
+            if not mask.all():
+                df = df[mask]
+            
+            # 按最终列顺序一次性组装结果，代替insert/astype/重排列的多次整表复制
+            columns = {
+                'NUM': np.arange(1, len(df) + 1),
+                'lot_ID': df['lot_ID'].astype(str).array
+            }
+            columns.update((col, df[col].array) for col in df.columns if col != 'lot_ID')
+            df = pd.DataFrame(columns)
             
             logger.info(f"数据清洗完成，最终行数: {len(df)}")
             logger.info(f"最终列数: {len(df.columns)}")
@@ -364,8 +405,8 @@ class DCDataCleaner:
             filename = generate_lot_based_filename(lot_ids, "DC")
             output_file = self.output_dir / filename
             
-            # 使用excel_utils中的快速写入函数
-            success = write_excel_fast(df, output_file, sheet_name='DC_Data')
+            # 使用xlsxwriter的constant_memory模式逐行写入，内存占用不随行数增长
+            success = write_excel_streaming(df, output_file, sheet_name='DC_Data')
             
             if success:
                 logger.info(f"DC数据保存成功: {output_file}")
@@ -389,6 +430,7 @@ class DCDataCleaner:
         logger.info("=" * 50)
         logger.info("开始DC数据清洗处理 (性能优化版)")
         logger.info("=" * 50)
+        get_performance_stats().reset()
         
         try:
             # 1. 使用excel_utils扫描文件
@@ -397,12 +439,15 @@ class DCDataCleaner:
                 logger.error("没有找到DC文件")
                 return False
             
-            # 2. 提取每个文件的数据
-            all_data_frames = []
-            for file_path in dc_files:
-                df = self.extract_dc_data(file_path)
-                if df is not None and not df.empty:
-                    all_data_frames.append(df)
+            # 2. 并行提取每个文件的数据（文件之间相互独立），未变化的文件直接读取缓存
+            cache = FileResultCache(self.cache_dir, 'DC', CACHE_VERSION) if self.cache_dir else None
+            results = map_files_parallel(self.extract_dc_data, dc_files, self.max_workers,
+                                         cache=cache, cancel_event=self.cancel_event)
+            if self.is_cancelled():
+                logger.warning("DC数据清洗已取消")
+                return False
+            all_data_frames = [df for df in results if df is not None and not df.empty]
+            del results
             
             if not all_data_frames:
                 logger.error("没有成功提取到任何数据")
@@ -416,11 +461,15 @@ class DCDataCleaner:
             
             # 4. 数据清洗和格式化
             cleaned_df = self.clean_and_format_dc(merged_df)
+            del merged_df  # 清洗结果是新构建的DataFrame，合并结果不再需要
             if cleaned_df.empty:
                 logger.error("数据清洗失败")
                 return False
             
             # 5. 保存结果
+            if self.is_cancelled():
+                logger.warning("DC数据清洗已取消")
+                return False
             success = self.save_dc_result(cleaned_df)
             
             if success:
@@ -433,13 +482,16 @@ class DCDataCleaner:
         except Exception as e:
             logger.error(f"处理DC文件时出现致命错误: {str(e)}", exc_info=True)
             return False
+        finally:
+            # 汇总本次处理的读写耗时（含并行工作进程交回的统计）
+            get_performance_stats().log_summary(logger)
 
 
 def main():
     """主函数"""
     try:
-        # 创建DC数据清洗器实例
-        cleaner = DCDataCleaner()
+        # 创建DC数据清洗器实例（命令行重复运行时复用未变化文件的提取结果）
+        cleaner = DCDataCleaner(cache_dir="../output/_cache")
         
         # 处理所有DC文件
         success = cleaner.process_all_dc_files()
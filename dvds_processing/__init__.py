@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""DVDS数据清洗包"""
@@ -13,33 +13,56 @@ from datetime import datetime
 import logging
 import re
 import sys
+import multiprocessing
 from pathlib import Path
 
-# 添加项目根目录到路径
 project_root = Path(__file__).parent.parent
-sys.path.append(str(project_root))
 
-from excel_utils import generate_lot_based_filename
+# 作为脚本直接运行时，将项目根目录添加到路径以便导入excel_utils；作为包导入时不修改sys.path
+if __name__ == "__main__":
+    sys.path.append(str(project_root))
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('dvds_cleaner.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
+from excel_utils import (
+    generate_lot_based_filename,
+    map_files_parallel,
+    FileResultCache,
+    CancellableMixin,
+    read_sheet_rows,
+    write_excel_streaming,
+    get_performance_stats
 )
 
-class DVDSCleaner:
+# 批次号模式，形如FA4Z-2484（4个字母数字 + 短横线 + 4个数字）
+_LOT_RE = re.compile(r'[A-Z0-9]{4}-[0-9]{4}')
+
+# 单文件提取结果的缓存版本号，修改extract_dvds_data的输出时需要递增
+CACHE_VERSION = 2
+
+# 配置日志（仅主进程；并行提取的工作进程经由队列把日志交回主进程）
+if multiprocessing.parent_process() is None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('dvds_cleaner.log', encoding='utf-8'),
+            logging.StreamHandler()
+        ]
+    )
+
+logger = logging.getLogger(__name__)
+
+class DVDSCleaner(CancellableMixin):
     """DVDS数据清洗器"""
     
-    def __init__(self, base_dir=None):
+    def __init__(self, base_dir=None, max_workers=None, cache_dir=None, cancel_event=None):
         """
         初始化DVDS清洗器
         
         Args:
             base_dir (str): 项目根目录，默认为当前目录的上级目录
+            max_workers (int): 并行提取文件的最大进程数，None表示使用CPU核心数，1表示串行
+            cache_dir (str): 单文件提取结果的缓存目录，None表示不使用缓存
+            cancel_event (threading.Event): 可选的取消事件，设置后在文件之间停止处理
         """
         if base_dir is None:
             # 默认为当前文件所在目录的上级目录
@@ -49,13 +72,17 @@ class DVDSCleaner:
             
         self.dvds_dir = os.path.join(self.base_dir, 'ASEData', 'DVDS')
         self.output_dir = os.path.join(self.base_dir, 'output')
+        self.max_workers = max_workers
+        self.cache_dir = cache_dir
+        self.cancel_event = cancel_event
+        self.result_df = None  # 最近一次成功处理并保存的数据，供调用方直接统计
         
         # 确保输出目录存在
         os.makedirs(self.output_dir, exist_ok=True)
         
-        logging.info(f"DVDS数据清洗器初始化完成")
-        logging.info(f"源数据目录: {self.dvds_dir}")
-        logging.info(f"输出目录: {self.output_dir}")
+        logger.info(f"DVDS数据清洗器初始化完成")
+        logger.info(f"源数据目录: {self.dvds_dir}")
+        logger.info(f"输出目录: {self.output_dir}")
     
     def scan_dvds_files(self):
         """
@@ -66,36 +93,37 @@ class DVDSCleaner:
         """
         try:
             if not os.path.exists(self.dvds_dir):
-                logging.error(f"DVDS目录不存在: {self.dvds_dir}")
+                logger.error(f"DVDS目录不存在: {self.dvds_dir}")
                 return []
             
             xlsx_files = []
             
-            # 遍历目录中的所有文件
-            for filename in os.listdir(self.dvds_dir):
-                # 检查文件扩展名
-                if not filename.lower().endswith('.xlsx'):
-                    continue
-                
-                # 排除Excel临时文件（以~$开头）
-                if filename.startswith('~$'):
-                    logging.info(f"跳过临时文件: {filename}")
-                    continue
-                
-                file_path = os.path.join(self.dvds_dir, filename)
-                
-                # 检查文件是否存在且大小大于0
-                if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
-                    xlsx_files.append(file_path)
-                    logging.info(f"找到有效文件: {filename}")
-                else:
-                    logging.warning(f"文件无效或为空: {filename}")
-            
-            logging.info(f"共找到 {len(xlsx_files)} 个有效的xlsx文件")
+            # 遍历目录中的所有文件（scandir的目录项自带文件类型，stat结果也会被缓存）
+            with os.scandir(self.dvds_dir) as entries:
+                for entry in entries:
+                    filename = entry.name
+                    
+                    # 检查文件扩展名
+                    if not filename.lower().endswith('.xlsx'):
+                        continue
+                    
+                    # 排除Excel临时文件（以~$开头）
+                    if filename.startswith('~$'):
+                        logger.info(f"跳过临时文件: {filename}")
+                        continue
+                    
+                    # 检查是否为文件且大小大于0
+                    if entry.is_file() and entry.stat().st_size > 0:
+                        xlsx_files.append(entry.path)
+                        logger.info(f"找到有效文件: {filename}")
+                    else:
+                        logger.warning(f"文件无效或为空: {filename}")
+            
+            logger.info(f"共找到 {len(xlsx_files)} 个有效的xlsx文件")
             return xlsx_files
             
         except Exception as e:
-            logging.error(f"扫描文件时发生错误: {str(e)}")
+            logger.error(f"扫描文件时发生错误: {str(e)}")
             return []
     
     def extract_batch_info(self, file_path):
@@ -110,18 +138,17 @@ class DVDSCleaner:
         """
         filename = os.path.basename(file_path)
         
-        # 使用正则表达式提取形如FA4Z-2484的模式（4个字母数字 + 短横线 + 4个数字）
-        pattern = r'[A-Z0-9]{4}-[0-9]{4}'
-        match = re.search(pattern, filename)
+        # 使用预编译的正则表达式提取形如FA4Z-2484的模式
+        match = _LOT_RE.search(filename)
         
         if match:
             lot_id = match.group()
-            logging.debug(f"提取批次信息: {filename} -> {lot_id}")
+            logger.debug("提取批次信息: %s -> %s", filename, lot_id)
             return lot_id
         else:
             # 如果正则匹配失败，回退到使用完整文件名
             lot_id = os.path.splitext(filename)[0]
-            logging.warning(f"正则匹配失败，使用完整文件名: {filename} -> {lot_id}")
+            logger.warning(f"正则匹配失败，使用完整文件名: {filename} -> {lot_id}")
             return lot_id
     
     def extract_dvds_data(self, file_path):
@@ -142,78 +169,70 @@ class DVDSCleaner:
         """
         try:
             filename = os.path.basename(file_path)
-            logging.info(f"开始提取DVDS数据: {filename}")
+            logger.info(f"开始提取DVDS数据: {filename}")
             
-            # 读取Excel文件 - 使用calamine引擎提升读取速度
-            df = pd.read_excel(file_path, header=None, engine='calamine')
-            logging.info(f"文件形状: {df.shape}")
+            # 读取Excel文件 - 直接用calamine读取原始行，不经过pd.read_excel
+            rows = read_sheet_rows(file_path)
             
             # 1. 在第2行查找DVDS列
-            row_2 = df.iloc[1]  # 第2行 (索引为1)
-            dvds_col = None
-            
-            for i in range(len(row_2)):
-                if pd.notna(row_2.iloc[i]) and str(row_2.iloc[i]).strip().upper() == "DVDS":
-                    dvds_col = i
-                    logging.info(f"找到DVDS列在第{i+1}列")
-                    break
+            row_2 = rows[1]  # 第2行 (索引为1)
+            dvds_col = next(
+                (i for i, value in enumerate(row_2)
+                 if isinstance(value, str) and value.strip().upper() == "DVDS"),
+                None
+            )
             
             if dvds_col is None:
-                logging.error(f"在第2行未找到DVDS列: {filename}")
+                logger.error(f"在第2行未找到DVDS列: {filename}")
                 return pd.DataFrame()
-            
-            # 2. 获取DVDS单位
-            unit_value = df.iloc[6, dvds_col]  # 第7行 (索引为6)
-            logging.info(f"DVDS单位: {unit_value}")
+            logger.info(f"找到DVDS列在第{dvds_col+1}列")
+            
+            # 2. 获取DVDS单位（第7行，索引为6）；空单元格读取为None，缺失时列名不带单位
+            unit_row = rows[6]
+            unit_value = unit_row[dvds_col] if dvds_col < len(unit_row) else None
+            unit_value = str(unit_value).strip() if unit_value is not None else ''
+            if unit_value:
+                logger.info(f"DVDS单位: {unit_value}")
+            else:
+                logger.warning(f"第7行未找到DVDS单位，列名使用'DVDS': {filename}")
+            dvds_name = f'DVDS({unit_value})' if unit_value else 'DVDS'
             
             # 3. 确认第19行是Test No.行
             test_no_row = 18  # 第19行 (索引为18)
-            if str(df.iloc[test_no_row, 0]).strip() != "Test No.":
-                logging.warning(f"第19行第1列不是'Test No.': {filename}")
+            if str(rows[test_no_row][0]).strip() != "Test No.":
+                logger.warning(f"第19行第1列不是'Test No.': {filename}")
             
             # 4. 从第20行开始提取数据
             data_start_row = 19  # 第20行 (索引为19)
-            dvds_values = []
+            raw_values = pd.Series([row[dvds_col] for row in rows[data_start_row:]], dtype=object)
             
-            for row_idx in range(data_start_row, df.shape[0]):
-                dvds_value = df.iloc[row_idx, dvds_col]
-                
-                # 跳过空值，继续处理后面的数据
-                if pd.isna(dvds_value):
-                    continue
-                
-                # 转换为数值
-                if isinstance(dvds_value, (int, float)):
-                    dvds_values.append(float(dvds_value))
-                elif isinstance(dvds_value, str):
-                    try:
-                        numeric_value = float(dvds_value)
-                        dvds_values.append(numeric_value)
-                    except ValueError:
-                        # 跳过非数值数据
-                        logging.warning(f"跳过非数值数据 行{row_idx+1}: '{dvds_value}'")
-                        continue
+            # 一次性转换为数值，空值和非数值数据均转为NaN后丢弃
+            numeric_values = pd.to_numeric(raw_values, errors='coerce')
+            skipped = int((numeric_values.isna() & raw_values.notna()).sum())
+            if skipped:
+                logger.warning(f"跳过 {skipped} 个非数值数据: {filename}")
+            dvds_values = numeric_values.dropna().to_numpy(dtype=float)
             
-            logging.info(f"成功提取 {len(dvds_values)} 个DVDS数据点")
+            logger.info(f"成功提取 {len(dvds_values)} 个DVDS数据点")
             
             # 5. 创建结果DataFrame
-            if dvds_values:
+            if len(dvds_values):
                 # 从文件名提取lot_ID (使用正则表达式)
                 lot_id = self.extract_batch_info(file_path)
                 
                 result_df = pd.DataFrame({
-                    'lot_ID': [lot_id] * len(dvds_values),
-                    f'DVDS({unit_value})': dvds_values
+                    'lot_ID': lot_id,
+                    dvds_name: dvds_values
                 })
                 
-                logging.info(f"成功创建DataFrame: {result_df.shape}")
+                logger.info(f"成功创建DataFrame: {result_df.shape}")
                 return result_df
             else:
-                logging.warning(f"未提取到任何有效数据: {filename}")
+                logger.warning(f"未提取到任何有效数据: {filename}")
                 return pd.DataFrame()
                 
         except Exception as e:
-            logging.error(f"提取DVDS数据时发生错误 {filename}: {str(e)}")
+            logger.error(f"提取DVDS数据时发生错误 {filename}: {str(e)}")
             return pd.DataFrame()
     
     def merge_all_data(self, data_list):
@@ -228,17 +247,17 @@ class DVDSCleaner:
         """
         try:
             if not data_list:
-                logging.warning("没有数据需要合并")
+                logger.warning("没有数据需要合并")
                 return pd.DataFrame()
             
             # 过滤掉空的DataFrame
             valid_data_list = [df for df in data_list if not df.empty]
             
             if not valid_data_list:
-                logging.warning("所有DataFrame都为空")
+                logger.warning("所有DataFrame都为空")
                 return pd.DataFrame()
             
-            logging.info(f"开始合并 {len(valid_data_list)} 个DataFrame")
+            logger.info(f"开始合并 {len(valid_data_list)} 个DataFrame")
             
             # 合并所有DataFrame
             merged_df = pd.concat(valid_data_list, ignore_index=True)
@@ -254,11 +273,11 @@ class DVDSCleaner:
             
             merged_df = merged_df[columns]
             
-            logging.info(f"数据合并完成，总共 {len(merged_df)} 行数据")
+            logger.info(f"数据合并完成，总共 {len(merged_df)} 行数据")
             return merged_df
             
         except Exception as e:
-            logging.error(f"合并数据时发生错误: {str(e)}")
+            logger.error(f"合并数据时发生错误: {str(e)}")
             return pd.DataFrame()
     
     def clean_and_format(self, df):
@@ -273,16 +292,16 @@ class DVDSCleaner:
         """
         try:
             if df.empty:
-                logging.warning("输入数据为空，无需清洗")
+                logger.warning("输入数据为空，无需清洗")
                 return df
             
-            logging.info(f"开始数据清洗，原始数据: {df.shape}")
+            logger.info(f"开始数据清洗，原始数据: {df.shape}")
             
             # 1. 删除空值行
             dvds_columns = [col for col in df.columns if 'DVDS' in col]
             if dvds_columns:
                 df_clean = df.dropna(subset=dvds_columns)
-                logging.info(f"删除空值后: {df_clean.shape}")
+                logger.info(f"删除空值后: {df_clean.shape}")
             else:
                 df_clean = df.copy()
             
@@ -294,16 +313,16 @@ class DVDSCleaner:
                 # 删除转换失败的行
                 df_clean = df_clean.dropna(subset=[col])
                 
-                logging.info(f"清洗{col}列后: {df_clean.shape}")
+                logger.info(f"清洗{col}列后: {df_clean.shape}")
             
             # 3. 重新生成连续编号
             df_clean['NUM'] = range(1, len(df_clean) + 1)
             
-            logging.info(f"数据清洗完成，最终数据: {df_clean.shape}")
+            logger.info(f"数据清洗完成，最终数据: {df_clean.shape}")
             return df_clean
             
         except Exception as e:
-            logging.error(f"数据清洗时发生错误: {str(e)}")
+            logger.error(f"数据清洗时发生错误: {str(e)}")
             return df
     
     def save_result(self, df):
@@ -318,7 +337,7 @@ class DVDSCleaner:
         """
         try:
             if df.empty:
-                logging.warning("没有数据需要保存")
+                logger.warning("没有数据需要保存")
                 return ""
             
             # 提取lot_ids用于生成文件名
@@ -328,16 +347,18 @@ class DVDSCleaner:
             filename = generate_lot_based_filename(lot_ids, "DVDS")
             filepath = os.path.join(self.output_dir, filename)
             
-            # 保存到Excel - 使用xlsxwriter引擎提升写入速度
-            df.to_excel(filepath, index=False, engine='xlsxwriter')
+            # 保存到Excel - xlsxwriter常量内存模式逐行流式写入
+            if not write_excel_streaming(df, filepath):
+                logger.error(f"保存数据失败: {filepath}")
+                return ""
             
-            logging.info(f"数据保存成功: {filepath}")
-            logging.info(f"保存了 {len(df)} 行数据")
+            logger.info(f"数据保存成功: {filepath}")
+            logger.info(f"保存了 {len(df)} 行数据")
             
             return filepath
             
         except Exception as e:
-            logging.error(f"保存数据时发生错误: {str(e)}")
+            logger.error(f"保存数据时发生错误: {str(e)}")
             return ""
     
     def process_all(self):
@@ -347,58 +368,69 @@ class DVDSCleaner:
         Returns:
             str: 输出文件路径，如果失败返回空字符串
         """
+        get_performance_stats().reset()
         try:
             # Phase 1: 扫描文件
-            logging.info("=== Phase 1: 扫描DVDS文件 ===")
+            logger.info("=== Phase 1: 扫描DVDS文件 ===")
             files = self.scan_dvds_files()
             
             if not files:
-                logging.error("未找到任何有效的xlsx文件")
+                logger.error("未找到任何有效的xlsx文件")
                 return ""
             
             # Phase 2: 提取数据
-            logging.info("=== Phase 2: 提取DVDS数据 ===")
-            data_list = []
-            
-            for file_path in files:
-                df = self.extract_dvds_data(file_path)
-                if not df.empty:
-                    data_list.append(df)
+            logger.info("=== Phase 2: 提取DVDS数据 ===")
+            # 各文件相互独立，并行提取；未变化的文件直接读取缓存
+            cache = FileResultCache(self.cache_dir, 'DVDS', CACHE_VERSION) if self.cache_dir else None
+            results = map_files_parallel(self.extract_dvds_data, files, self.max_workers,
+                                         cache=cache, cancel_event=self.cancel_event)
+            if self.is_cancelled():
+                logger.warning("DVDS数据清洗已取消")
+                return ""
+            data_list = [df for df in results if not df.empty]
             
             if not data_list:
-                logging.error("未能从任何文件中提取到有效数据")
+                logger.error("未能从任何文件中提取到有效数据")
                 return ""
             
             # Phase 3: 合并和清洗数据
-            logging.info("=== Phase 3: 合并和清洗数据 ===")
+            logger.info("=== Phase 3: 合并和清洗数据 ===")
             merged_df = self.merge_all_data(data_list)
             
             if merged_df.empty:
-                logging.error("数据合并失败")
+                logger.error("数据合并失败")
                 return ""
             
             cleaned_df = self.clean_and_format(merged_df)
             
             if cleaned_df.empty:
-                logging.error("数据清洗失败")
+                logger.error("数据清洗失败")
                 return ""
             
             # Phase 4: 保存结果
-            logging.info("=== Phase 4: 保存结果 ===")
+            if self.is_cancelled():
+                logger.warning("DVDS数据清洗已取消")
+                return ""
+            logger.info("=== Phase 4: 保存结果 ===")
             output_file = self.save_result(cleaned_df)
+            if output_file:
+                self.result_df = cleaned_df
             
             if output_file:
-                logging.info("=== 处理完成 ===")
-                logging.info(f"成功处理 {len(files)} 个文件")
-                logging.info(f"输出文件: {output_file}")
+                logger.info("=== 处理完成 ===")
+                logger.info(f"成功处理 {len(files)} 个文件")
+                logger.info(f"输出文件: {output_file}")
                 return output_file
             else:
-                logging.error("保存结果失败")
+                logger.error("保存结果失败")
                 return ""
             
         except Exception as e:
-            logging.error(f"处理过程中发生错误: {str(e)}")
+            logger.error(f"处理过程中发生错误: {str(e)}")
             return ""
+        finally:
+            # 汇总本次处理的读写耗时（含并行工作进程交回的统计）
+            get_performance_stats().log_summary(logger)
 
 
 def main():
@@ -407,8 +439,8 @@ def main():
     print("DVDS数据清洗工具 - 完整流程处理")
     print("=" * 60)
     
-    # 创建清洗器实例
-    cleaner = DVDSCleaner()
+    # 创建清洗器实例（提取结果缓存在输出目录下）
+    cleaner = DVDSCleaner(cache_dir=os.path.join(project_root, 'output', '_cache'))
     
     # 执行完整处理流程
     print("\n开始执行完整的DVDS数据处理流程...")
@@ -419,14 +451,15 @@ def main():
         print(f"✅ 输出文件: {os.path.basename(output_file)}")
         print(f"📁 文件路径: {output_file}")
         
-        # 显示简单统计
+        # 显示简单统计（直接使用内存中的结果，无需重新读取输出文件）
         try:
-            result_df = pd.read_excel(output_file)
+            result_df = cleaner.result_df
             print(f"\n📊 数据统计:")
             print(f"   总数据点: {len(result_df)}")
             dvds_col = [col for col in result_df.columns if 'DVDS' in col][0]
-            print(f"   DVDS范围: {result_df[dvds_col].min():.1f} ~ {result_df[dvds_col].max():.1f} mV")
-            print(f"   DVDS平均: {result_df[dvds_col].mean():.2f} mV")
+            stats = result_df[dvds_col].agg(['min', 'max', 'mean'])
+            print(f"   DVDS范围: {stats['min']:.1f} ~ {stats['max']:.1f} mV")
+            print(f"   DVDS平均: {stats['mean']:.2f} mV")
             print(f"   不同lot数: {result_df['lot_ID'].nunique()}")
         except:
             pass
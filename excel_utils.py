@@ -14,14 +14,35 @@ Excel性能优化工具模块
 """
 
 import os
+import numpy as np
 import pandas as pd
 import re
+import json
+import fnmatch
+import hashlib
 import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 from datetime import datetime
-from typing import List, Optional, Union, Dict, Any
+from typing import List, Optional, Union, Dict, Any, Callable
 import time
-from functools import wraps
+from array import array
+from functools import wraps, lru_cache
+
+
+logger = logging.getLogger(__name__)
+
+# 文件数少于该值时串行处理，进程启动开销（每个进程都要导入pandas）会抵消并行收益
+PARALLEL_MIN_FILES = 4
+
+# 并行处理时检查取消事件的间隔（秒）
+CANCEL_POLL_INTERVAL = 0.2
+
+# 扫描到的文件数不超过该值时才在INFO级别逐个列出文件名
+SCAN_LOG_MAX_FILES = 20
 
 
 class ExcelOptimizer:
@@ -35,8 +56,33 @@ class ExcelOptimizer:
             log_performance: 是否记录性能日志
         """
         self.log_performance = log_performance
-        self.logger = logging.getLogger(__name__)
+        self.logger = logger
+        self._batch_ts = None  # 批处理期间共用的时间戳，见start_batch
         
+    def _record_timing(self, operation: str, file_path: Union[str, Path], shape: tuple,
+                       start_time: float, level: int):
+        """
+        记录单次读写的耗时
+        
+        耗时汇总到全局性能统计（各清洗器在处理结束时统一输出摘要）；逐文件的日志使用延迟格式化，
+        读取类操作以DEBUG级别输出，避免批量处理时每个文件都格式化并写一条日志。
+        
+        Args:
+            operation: 操作名称
+            file_path: 文件路径
+            shape: (行数, 列数)
+            start_time: 开始时间
+            level: 日志级别
+        """
+        if not self.log_performance:
+            return
+        
+        elapsed = time.time() - start_time
+        _global_stats.record(operation, elapsed, shape[0])
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, "%s: %s (%d行x%d列) 耗时: %.3f秒",
+                            operation, Path(file_path).name, shape[0], shape[1], elapsed)
+    
     def read_excel_fast(self, file_path: Union[str, Path], **kwargs) -> pd.DataFrame:
         """
         快速读取Excel文件
@@ -57,10 +103,7 @@ class ExcelOptimizer:
             
             df = pd.read_excel(file_path, **kwargs)
             
-            if self.log_performance:
-                elapsed = time.time() - start_time
-                self.logger.info(f"快速读取Excel: {Path(file_path).name} "
-                               f"({df.shape[0]}行x{df.shape[1]}列) 耗时: {elapsed:.3f}秒")
+            self._record_timing("快速读取Excel", file_path, df.shape, start_time, logging.DEBUG)
             
             return df
             
@@ -72,7 +115,64 @@ class ExcelOptimizer:
                 return self.read_excel_fast(file_path, **kwargs)
             else:
                 raise e
-    
+
+    def read_sheet_rows(self, file_path: Union[str, Path], nrows: Optional[int] = None) -> List[tuple]:
+        """
+        以行元组列表的形式读取第一个工作表，不经过pandas的解析流程
+
+        优先使用calamine直接读取，失败时回退到openpyxl只读流式模式
+        （read_only + values_only），两者都不会构建完整的单元格对象树。
+        空单元格统一为None，整数值的浮点数转换为int，与pd.read_excel的结果保持一致。
+
+        Args:
+            file_path: Excel文件路径
+            nrows: 最多读取的行数，None表示读取全部
+
+        Returns:
+            List[tuple]: 按行排列的单元格值
+        """
+        start_time = time.time()
+
+        try:
+            rows = self._read_rows_calamine(file_path, nrows)
+        except Exception as e:
+            self.logger.warning(f"calamine引擎失败，回退到openpyxl只读模式: {str(e)}")
+            rows = self._read_rows_openpyxl(file_path, nrows)
+
+        width = len(rows[0]) if rows else 0
+        self._record_timing("快速读取Excel", file_path, (len(rows), width), start_time, logging.DEBUG)
+
+        return rows
+
+    @staticmethod
+    def _read_rows_calamine(file_path: Union[str, Path], nrows: Optional[int]) -> List[tuple]:
+        """使用python-calamine读取第一个工作表的原始行"""
+        from python_calamine import CalamineWorkbook
+
+        wb = CalamineWorkbook.from_path(str(file_path))
+        try:
+            # skip_empty_area=False 保证行列索引与Excel中的位置一致
+            data = wb.get_sheet_by_index(0).to_python(skip_empty_area=False, nrows=nrows)
+        finally:
+            if hasattr(wb, 'close'):
+                wb.close()
+
+        return [tuple(_normalize_cell(value) for value in row) for row in data]
+
+    @staticmethod
+    def _read_rows_openpyxl(file_path: Union[str, Path], nrows: Optional[int]) -> List[tuple]:
+        """使用openpyxl只读流式模式读取第一个工作表的原始行"""
+        from openpyxl import load_workbook
+
+        wb = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            ws = wb.worksheets[0]
+            return [tuple(_normalize_cell(value) for value in row)
+                    for row in ws.iter_rows(max_row=nrows, values_only=True)]
+        finally:
+            # 显式关闭以释放ZipFile句柄
+            wb.close()
+
     def write_excel_fast(self, df: pd.DataFrame, file_path: Union[str, Path], 
                         **kwargs) -> bool:
         """
@@ -99,10 +199,7 @@ class ExcelOptimizer:
             
             df.to_excel(file_path, **kwargs)
             
-            if self.log_performance:
-                elapsed = time.time() - start_time
-                self.logger.info(f"快速写入Excel: {Path(file_path).name} "
-                               f"({len(df)}行x{len(df.columns)}列) 耗时: {elapsed:.3f}秒")
+            self._record_timing("快速写入Excel", file_path, df.shape, start_time, logging.INFO)
             
             return True
             
@@ -116,6 +213,49 @@ class ExcelOptimizer:
                 self.logger.error(f"Excel写入失败: {str(e)}")
                 return False
     
+    def write_excel_streaming(self, df: pd.DataFrame, file_path: Union[str, Path],
+                              sheet_name: str = 'Sheet1') -> bool:
+        """
+        使用xlsxwriter的constant_memory模式逐行写入Excel
+        
+        pandas的to_excel按列写入单元格，与constant_memory模式（写完一行即刷新到磁盘）
+        不兼容，因此这里直接按行调用xlsxwriter，内存占用与行数无关。
+        不写入索引，表头样式与to_excel一致，缺失值写为空单元格。
+        
+        Args:
+            df: 要写入的DataFrame
+            file_path: 输出文件路径
+            sheet_name: 工作表名称
+            
+        Returns:
+            bool: 写入是否成功
+        """
+        start_time = time.time()
+        
+        try:
+            import xlsxwriter
+            
+            workbook = xlsxwriter.Workbook(str(file_path), {'constant_memory': True})
+            try:
+                worksheet = workbook.add_worksheet(sheet_name)
+                header_format = workbook.add_format(
+                    {'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'}
+                )
+                worksheet.write_row(0, 0, [str(col) for col in df.columns], header_format)
+                
+                for row_idx, row in enumerate(df.itertuples(index=False, name=None), start=1):
+                    worksheet.write_row(row_idx, 0, [_excel_cell(value) for value in row])
+            finally:
+                workbook.close()
+                
+        except Exception as e:
+            self.logger.warning(f"xlsxwriter流式写入失败，回退到常规写入: {str(e)}")
+            return self.write_excel_fast(df, file_path, sheet_name=sheet_name)
+        
+        self._record_timing("流式写入Excel", file_path, df.shape, start_time, logging.INFO)
+        
+        return True
+    
     def extract_batch_id(self, filename: str, pattern: str = r'[A-Z0-9]{4}-[0-9]{4}') -> str:
         """
         从文件名中提取批次信息
@@ -127,11 +267,11 @@ class ExcelOptimizer:
         Returns:
             str: 批次ID
         """
-        match = re.search(pattern, filename)
+        match = _compile_pattern(pattern).search(filename)
         
         if match:
             lot_id = match.group()
-            self.logger.debug(f"提取批次信息: {filename} -> {lot_id}")
+            self.logger.debug("提取批次信息: %s -> %s", filename, lot_id)
             return lot_id
         else:
             # 如果正则匹配失败，使用文件名（去除扩展名）
@@ -157,15 +297,18 @@ class ExcelOptimizer:
             self.logger.error(f"目录不存在: {directory}")
             return []
         
-        # 扫描文件，排除临时文件(~$开头)
-        xlsx_files = []
-        for file_path in directory.glob(pattern):
-            if not file_path.name.startswith("~$") and file_path.is_file():
-                xlsx_files.append(file_path)
+        # 扫描文件，排除临时文件(~$开头)和隐藏文件(与glob一致)；scandir的目录项自带文件类型，无需逐个stat
+        with os.scandir(directory) as entries:
+            names = {entry.name: entry for entry in entries
+                     if not entry.name.startswith(("~$", ".")) and entry.is_file()}
+        xlsx_files = [Path(names[name].path) for name in fnmatch.filter(names, pattern)]
         
         self.logger.info(f"扫描目录 {directory}，找到 {len(xlsx_files)} 个Excel文件")
-        for file_path in xlsx_files:
-            self.logger.info(f"  - {file_path.name}")
+        # 文件较多时逐个文件名只在DEBUG级别输出，避免刷屏
+        level = logging.INFO if len(xlsx_files) <= SCAN_LOG_MAX_FILES else logging.DEBUG
+        if self.logger.isEnabledFor(level):
+            for file_path in xlsx_files:
+                self.logger.log(level, "  - %s", file_path.name)
         
         return xlsx_files
     
@@ -180,8 +323,299 @@ class ExcelOptimizer:
         Returns:
             str: 生成的文件名
         """
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        return f"{prefix}_{timestamp}{extension}"
+        return f"{prefix}_{self.get_timestamp()}{extension}"
+    
+    def start_batch(self) -> str:
+        """
+        开始一次批处理：固定本次批处理的时间戳，期间生成的所有输出文件名共用该时间戳
+        
+        Returns:
+            str: 本次批处理的时间戳
+        """
+        self._batch_ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return self._batch_ts
+    
+    def end_batch(self):
+        """结束批处理，之后生成的文件名重新使用当前时间"""
+        self._batch_ts = None
+    
+    def get_timestamp(self) -> str:
+        """输出文件名使用的时间戳：批处理期间返回批次时间戳，否则返回当前时间"""
+        return self._batch_ts or datetime.now().strftime("%Y%m%d_%H%M%S")
+
+
+def _normalize_cell(value):
+    """将原始单元格值转换为与pd.read_excel一致的形式（空字符串视为缺失值）"""
+    if value == '':
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _excel_cell(value):
+    """将缺失值（None/NaN/pd.NA）转换为None，xlsxwriter会将其写为空单元格"""
+    if value is None or value is pd.NA:
+        return None
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+@lru_cache(maxsize=32)
+def _compile_pattern(pattern: str) -> re.Pattern:
+    """编译并缓存正则表达式（批次号等模式在每个文件上重复使用）"""
+    return re.compile(pattern)
+
+
+def _init_worker_logging(log_queue, level: int):
+    """进程池工作进程初始化：日志记录统一通过队列交回主进程的处理器"""
+    root = logging.getLogger()
+    root.handlers[:] = [QueueHandler(log_queue)]
+    root.setLevel(level)
+
+
+class _LoggerDispatchHandler(logging.Handler):
+    """将工作进程发回的日志记录交给主进程中同名的logger处理
+
+    这样记录会经过调用方为该logger配置的级别和处理器，
+    而不是一律发送到根logger的处理器。
+    """
+    def handle(self, record):
+        record_logger = logging.getLogger(record.name)
+        if record_logger.isEnabledFor(record.levelno):
+            record_logger.handle(record)
+        return True
+
+    def emit(self, record):
+        pass
+
+
+class FileResultCache:
+    """
+    按源文件的(修改时间, 大小)缓存单个文件的提取结果
+    
+    缓存的DataFrame以pickle格式保存在cache_dir中，清单文件记录每个源文件对应的缓存。
+    源文件未变化时直接读取缓存，跳过xlsx解析。提取逻辑变化时应递增version，
+    旧版本的清单会被整体丢弃。
+    """
+    
+    def __init__(self, cache_dir: Union[str, Path], namespace: str, version: int = 1):
+        """
+        初始化缓存
+        
+        Args:
+            cache_dir: 缓存目录
+            namespace: 缓存命名空间（如DC/DVDS），不同数据类型使用各自的清单
+            version: 提取逻辑版本号
+        """
+        self.cache_dir = Path(cache_dir)
+        self.namespace = namespace
+        self.version = version
+        self.logger = logger
+        self.manifest_path = self.cache_dir / f"{namespace}_manifest.json"
+        self.entries = self._load_manifest()
+    
+    def _load_manifest(self) -> Dict[str, Any]:
+        """读取清单文件，版本不一致或文件损坏时返回空清单"""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        
+        if manifest.get('version') != self.version:
+            self.logger.info(f"{self.namespace}缓存版本变化，忽略旧缓存")
+            return {}
+        return manifest.get('entries', {})
+    
+    @staticmethod
+    def _file_key(file_path: Path) -> List[int]:
+        """源文件的缓存键：[修改时间(纳秒), 文件大小]"""
+        stat = file_path.stat()
+        return [stat.st_mtime_ns, stat.st_size]
+    
+    def _cache_file(self, file_path: Path) -> Path:
+        """源文件对应的缓存文件路径（文件名附加路径哈希以避免同名冲突）"""
+        digest = hashlib.md5(str(file_path.resolve()).encode('utf-8')).hexdigest()[:8]
+        return self.cache_dir / f"{self.namespace}_{file_path.stem}_{digest}.pkl"
+    
+    def get(self, file_path: Union[str, Path]) -> Optional[pd.DataFrame]:
+        """源文件未变化时返回缓存的结果，否则返回None"""
+        file_path = Path(file_path)
+        entry = self.entries.get(str(file_path.resolve()))
+        
+        try:
+            if entry is None or entry['key'] != self._file_key(file_path):
+                return None
+            return pd.read_pickle(self.cache_dir / entry['cache_file'])
+        except Exception as e:
+            self.logger.warning(f"读取缓存失败，重新解析 {file_path.name}: {str(e)}")
+            return None
+    
+    def put(self, file_path: Union[str, Path], df: pd.DataFrame):
+        """保存单个文件的提取结果"""
+        file_path = Path(file_path)
+        cache_file = self._cache_file(file_path)
+        
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            df.to_pickle(cache_file)
+            self.entries[str(file_path.resolve())] = {
+                'key': self._file_key(file_path),
+                'cache_file': cache_file.name,
+            }
+        except Exception as e:
+            self.logger.warning(f"写入缓存失败 {file_path.name}: {str(e)}")
+    
+    def prune(self):
+        """删除源文件已不存在的缓存条目及其缓存文件"""
+        stale = [path for path in self.entries if not Path(path).exists()]
+        for path in stale:
+            entry = self.entries.pop(path)
+            try:
+                (self.cache_dir / entry['cache_file']).unlink(missing_ok=True)
+            except OSError as e:
+                self.logger.warning(f"删除过期缓存失败 {entry['cache_file']}: {str(e)}")
+        
+        if stale:
+            self.logger.info(f"清理 {len(stale)} 个过期的{self.namespace}缓存")
+    
+    def save(self):
+        """清理过期条目后写入清单文件"""
+        self.prune()
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.manifest_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.version, 'entries': self.entries}, f,
+                          ensure_ascii=False, indent=2)
+        except OSError as e:
+            self.logger.warning(f"写入缓存清单失败: {str(e)}")
+
+
+class CancellableMixin:
+    """
+    支持协作式取消的清洗器混入类
+    
+    清洗器把自身的实例方法交给map_files_parallel，实例会随之被pickle到工作进程；
+    取消事件只在主进程使用且不可pickle，pickle时置为None。
+    取消只在文件之间检查，另外在开始写入结果前最后检查一次：输出文件一旦开始写入
+    就不可中断，写入前检查可避免取消后仍留下写了一半的文件。
+    """
+    
+    cancel_event: Optional[threading.Event] = None
+    
+    def __getstate__(self):
+        """pickle时去掉取消事件"""
+        state = self.__dict__.copy()
+        state['cancel_event'] = None
+        return state
+    
+    def is_cancelled(self) -> bool:
+        """是否已请求取消处理"""
+        return self.cancel_event is not None and self.cancel_event.is_set()
+
+
+def map_files_parallel(func: Callable, file_paths: List[Union[str, Path]],
+                       max_workers: Optional[int] = None,
+                       min_files: int = PARALLEL_MIN_FILES,
+                       cache: Optional[FileResultCache] = None,
+                       cancel_event: Optional[threading.Event] = None) -> list:
+    """
+    使用进程池对多个文件并行执行func，结果顺序与输入顺序一致
+    
+    文件数较少或只有一个可用核心时直接串行执行。工作进程中的日志通过队列
+    交回主进程中同名的logger，由调用方为其配置的处理器（日志文件、GUI等）处理。
+    指定cache时，未变化的文件直接读取缓存，只有其余文件会交给func处理。
+    cancel_event被设置后不再开始处理新文件，正在处理的文件会正常完成。
+    
+    Args:
+        func: 处理单个文件的可pickle函数（模块级函数或可pickle对象的方法）
+        file_paths: 文件路径列表
+        max_workers: 最大进程数，None表示使用CPU核心数
+        min_files: 启用并行处理的最少文件数
+        cache: 可选的文件结果缓存
+        cancel_event: 可选的取消事件
+        
+    Returns:
+        list: 每个文件的处理结果，取消后未处理的文件结果为None
+    """
+    file_paths = list(file_paths)
+    if cache is None:
+        return _map_files(func, file_paths, max_workers, min_files, cancel_event)
+    
+    results = [cache.get(file_path) for file_path in file_paths]
+    pending = [i for i, result in enumerate(results) if result is None]
+    logger.info(
+        f"缓存命中 {len(file_paths) - len(pending)}/{len(file_paths)} 个文件"
+    )
+    
+    if pending:
+        computed = _map_files(func, [file_paths[i] for i in pending], max_workers, min_files,
+                              cancel_event)
+        for i, result in zip(pending, computed):
+            results[i] = result
+            # 空结果可能来自读取失败（如文件被占用），不缓存以便下次重试
+            if result is not None and not result.empty:
+                cache.put(file_paths[i], result)
+        cache.save()
+    
+    return results
+
+
+def _call_with_stats(func: Callable, file_path):
+    """在工作进程中执行func，并返回本次调用记录的性能统计，由主进程合并"""
+    _global_stats.reset()
+    return func(file_path), _global_stats.stats
+
+
+def _map_files(func: Callable, file_paths: list, max_workers: Optional[int],
+               min_files: int, cancel_event: Optional[threading.Event] = None) -> list:
+    """map_files_parallel的实际执行部分（不含缓存）"""
+    workers = min(max_workers or os.cpu_count() or 1, len(file_paths))
+    results = [None] * len(file_paths)
+    
+    def cancelled() -> bool:
+        if cancel_event is not None and cancel_event.is_set():
+            logger.warning("处理已取消，跳过剩余文件")
+            return True
+        return False
+    
+    if workers <= 1 or len(file_paths) < min_files:
+        for i, file_path in enumerate(file_paths):
+            if cancelled():
+                break
+            results[i] = func(file_path)
+        return results
+    
+    # 工作进程沿用调用方模块logger的有效级别，低于该级别的记录不必经队列传回
+    log_level = logging.getLogger(getattr(func, '__module__', None) or '').getEffectiveLevel()
+    log_queue = multiprocessing.Queue()
+    listener = QueueListener(log_queue, _LoggerDispatchHandler())
+    listener.start()
+    
+    try:
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_init_worker_logging,
+                                 initargs=(log_queue, log_level)) as executor:
+            # 工作进程中的性能统计随进程退出丢失，随结果一并交回主进程合并
+            futures = [executor.submit(_call_with_stats, func, file_path) for file_path in file_paths]
+            for i, future in enumerate(futures):
+                # 定时检查取消事件，取消后撤销尚未开始的任务
+                while True:
+                    if cancelled():
+                        for pending in futures[i:]:
+                            pending.cancel()
+                        return results
+                    try:
+                        results[i], stats = future.result(timeout=CANCEL_POLL_INTERVAL)
+                        _global_stats.merge(stats)
+                        break
+                    except FutureTimeoutError:
+                        continue
+            return results
+    finally:
+        listener.stop()
 
 
 def performance_monitor(func):
@@ -192,53 +626,67 @@ def performance_monitor(func):
         result = func(*args, **kwargs)
         elapsed = time.time() - start_time
         
-        logger = logging.getLogger(__name__)
         logger.info(f"函数 {func.__name__} 执行耗时: {elapsed:.3f}秒")
         
         return result
     return wrapper
 
 
-# 全局优化器实例
-_global_optimizer = None
+# 全局优化器实例（模块导入时创建，便捷函数直接使用，无需每次检查是否已创建）
+_global_optimizer = ExcelOptimizer()
 
-def get_excel_optimizer(log_performance: bool = True) -> ExcelOptimizer:
-    """获取全局Excel优化器实例"""
-    global _global_optimizer
-    if _global_optimizer is None:
-        _global_optimizer = ExcelOptimizer(log_performance=log_performance)
+def get_excel_optimizer(log_performance: Optional[bool] = None) -> ExcelOptimizer:
+    """获取全局Excel优化器实例，指定log_performance时同时设置是否记录性能日志"""
+    if log_performance is not None:
+        _global_optimizer.log_performance = log_performance
     return _global_optimizer
 
 
 # 便捷函数
 def read_excel_fast(file_path: Union[str, Path], **kwargs) -> pd.DataFrame:
     """快速读取Excel文件的便捷函数"""
-    optimizer = get_excel_optimizer()
-    return optimizer.read_excel_fast(file_path, **kwargs)
+    return _global_optimizer.read_excel_fast(file_path, **kwargs)
+
+
+def read_sheet_rows(file_path: Union[str, Path], nrows: Optional[int] = None) -> List[tuple]:
+    """以行元组列表读取第一个工作表的便捷函数"""
+    return _global_optimizer.read_sheet_rows(file_path, nrows)
 
 
 def write_excel_fast(df: pd.DataFrame, file_path: Union[str, Path], **kwargs) -> bool:
     """快速写入Excel文件的便捷函数"""
-    optimizer = get_excel_optimizer()
-    return optimizer.write_excel_fast(df, file_path, **kwargs)
+    return _global_optimizer.write_excel_fast(df, file_path, **kwargs)
+
+
+def write_excel_streaming(df: pd.DataFrame, file_path: Union[str, Path],
+                          sheet_name: str = 'Sheet1') -> bool:
+    """以constant_memory模式逐行写入Excel的便捷函数"""
+    return _global_optimizer.write_excel_streaming(df, file_path, sheet_name)
 
 
 def extract_batch_id(filename: str, pattern: str = r'[A-Z0-9]{4}-[0-9]{4}') -> str:
     """从文件名提取批次ID的便捷函数"""
-    optimizer = get_excel_optimizer()
-    return optimizer.extract_batch_id(filename, pattern)
+    return _global_optimizer.extract_batch_id(filename, pattern)
 
 
 def scan_excel_files(directory: Union[str, Path], pattern: str = "*.xlsx") -> List[Path]:
     """扫描Excel文件的便捷函数"""
-    optimizer = get_excel_optimizer()
-    return optimizer.scan_excel_files(directory, pattern)
+    return _global_optimizer.scan_excel_files(directory, pattern)
 
 
 def generate_output_filename(prefix: str, extension: str = ".xlsx") -> str:
     """生成输出文件名的便捷函数"""
-    optimizer = get_excel_optimizer()
-    return optimizer.generate_output_filename(prefix, extension)
+    return _global_optimizer.generate_output_filename(prefix, extension)
+
+
+def start_batch() -> str:
+    """开始批处理（输出文件名共用同一时间戳）的便捷函数"""
+    return _global_optimizer.start_batch()
+
+
+def end_batch():
+    """结束批处理的便捷函数"""
+    _global_optimizer.end_batch()
 
 
 def generate_lot_based_filename(lot_ids: list, data_type: str, extension: str = ".xlsx") -> str:
@@ -253,7 +701,7 @@ def generate_lot_based_filename(lot_ids: list, data_type: str, extension: str =
     Returns:
         str: 生成的文件名
     """
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    timestamp = _global_optimizer.get_timestamp()
     
     # 如果只有一个lot_id，直接使用
     if len(set(lot_ids)) == 1:
@@ -268,35 +716,58 @@ class PerformanceStats:
     """性能统计工具"""
     
     def __init__(self):
+        # 每种操作按字段分列存储（紧凑数组），汇总时一次性转换为numpy数组计算
         self.stats = {}
     
+    def _records(self, operation: str) -> Dict[str, Any]:
+        """返回某种操作的记录，不存在时创建"""
+        records = self.stats.get(operation)
+        if records is None:
+            records = self.stats[operation] = {
+                'duration': array('d'),
+                'data_size': array('q'),
+                'timestamp': []
+            }
+        return records
+    
     def record(self, operation: str, duration: float, data_size: int = 0):
         """记录性能数据"""
-        if operation not in self.stats:
-            self.stats[operation] = []
-        
-        self.stats[operation].append({
-            'duration': duration,
-            'data_size': data_size,
-            'timestamp': datetime.now()
-        })
+        records = self._records(operation)
+        records['duration'].append(duration)
+        records['data_size'].append(data_size)
+        records['timestamp'].append(datetime.now())
+    
+    def reset(self):
+        """清空已记录的性能数据"""
+        self.stats = {}
+    
+    def merge(self, stats: Dict[str, Dict[str, Any]]):
+        """合并另一份统计数据（如工作进程返回的stats）"""
+        for operation, other in stats.items():
+            records = self._records(operation)
+            for field, values in other.items():
+                records[field].extend(values)
     
     def get_summary(self) -> Dict[str, Any]:
         """获取性能摘要"""
         summary = {}
         
         for operation, records in self.stats.items():
-            durations = [r['duration'] for r in records]
-            data_sizes = [r['data_size'] for r in records if r['data_size'] > 0]
+            durations = np.asarray(records['duration'])
+            data_sizes = np.asarray(records['data_size'])
+            data_sizes = data_sizes[data_sizes > 0]
+            has_data = durations.size > 0
+            total_time = float(durations.sum())
+            total_data = int(data_sizes.sum())
             
             summary[operation] = {
-                'count': len(records),
-                'total_time': sum(durations),
-                'avg_time': sum(durations) / len(durations) if durations else 0,
-                'min_time': min(durations) if durations else 0,
-                'max_time': max(durations) if durations else 0,
-                'total_data': sum(data_sizes),
-                'avg_throughput': sum(data_sizes) / sum(durations) if durations and data_sizes else 0
+                'count': int(durations.size),
+                'total_time': total_time,
+                'avg_time': float(durations.mean()) if has_data else 0,
+                'min_time': float(durations.min()) if has_data else 0,
+                'max_time': float(durations.max()) if has_data else 0,
+                'total_data': total_data,
+                'avg_throughput': total_data / total_time if has_data and data_sizes.size else 0
             }
         
         return summary
@@ -318,6 +789,16 @@ class PerformanceStats:
                 print(f"   平均处理速度: {stats['avg_throughput']:.0f} 行/秒")
         
         print("\n" + "=" * 60)
+    
+    def log_summary(self, log: Optional[logging.Logger] = None):
+        """以日志形式输出性能摘要，每种操作一行"""
+        log = log or logger
+        for operation, stats in self.get_summary().items():
+            message = (f"{operation}: {stats['count']}次, 总耗时 {stats['total_time']:.3f}秒, "
+                       f"平均 {stats['avg_time']:.3f}秒")
+            if stats['avg_throughput'] > 0:
+                message += f", 平均处理速度 {stats['avg_throughput']:.0f} 行/秒"
+            log.info(message)
 
 
 # 全局性能统计实例
@@ -10,66 +10,60 @@ FT数据清洗工具 - GUI版本
 import sys
 import os
 import threading
+from collections import deque
 from pathlib import Path
 from datetime import datetime
 import logging
+import queue
+from logging.handlers import QueueHandler
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QLabel, QLineEdit, QPushButton, 
-                             QTextEdit, QRadioButton, QButtonGroup, QGroupBox,
-                             QFileDialog, QMessageBox, QProgressBar)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer, QObject
-from PyQt5.QtGui import QFont, QIcon, QPalette, QColor
+                             QPlainTextEdit, QRadioButton, QButtonGroup, QGroupBox,
+                             QCheckBox,
+                             QFileDialog, QMessageBox)
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, pyqtSignal, QTimer
+from PyQt5.QtGui import QFont, QIcon, QFontDatabase
 
-# 将项目根目录添加到Python路径
+# 将项目根目录添加到Python路径，清洗器按包导入（dc_processing.dc_cleaner等）
+# 清洗器模块（连带pandas等依赖）在开始清洗时才导入，缩短界面启动时间
 project_root = Path(__file__).parent.parent
-sys.path.append(str(project_root / 'dc_processing'))
-sys.path.append(str(project_root / 'dvds_processing'))  
-sys.path.append(str(project_root / 'rg_processing'))
+if str(project_root) not in sys.path:
+    sys.path.append(str(project_root))
 
-from dc_cleaner import DCDataCleaner
-from dvds_cleaner import DVDSCleaner
-from rg_cleaner import RGCleaner
+# 状态区域日志格式，在GUI线程刷新时才对日志记录进行格式化
+LOG_FORMATTER = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 
-class LogEmitter(QObject):
-    """日志信号发射器，因为logging.Handler不能直接继承QObject"""
-    log_received = pyqtSignal(str)
+class RecordQueueHandler(QueueHandler):
+    """同一进程内传递日志记录的QueueHandler，入队时不做格式化"""
+    def prepare(self, record):
+        return record
 
-class QtLogHandler(logging.Handler):
-    """自定义日志处理器，将日志记录发送到PyQt信号"""
-    def __init__(self, emitter):
-        super().__init__()
-        self.emitter = emitter
-
-    def emit(self, record):
-        msg = self.format(record)
-        self.emitter.log_received.emit(msg)
-
-class DataCleanerWorker(QThread):
-    """数据清洗工作线程"""
-    
-    # 信号定义
+class WorkerSignals(QObject):
+    """清洗任务的信号（QRunnable不是QObject，不能直接定义信号）"""
     progress_updated = pyqtSignal(str)  # 进度更新信号
     finished = pyqtSignal(str, bool)    # 完成信号 (结果信息, 是否成功)
     error_occurred = pyqtSignal(str)    # 错误信号
+
+class DataCleanerWorker(QRunnable):
+    """数据清洗任务，在全局QThreadPool中运行，多次清洗复用线程池中的线程"""
     
     def __init__(self, cleaner_type, input_dir, output_dir):
         super().__init__()
+        self.setAutoDelete(False)  # 由界面持有引用（退出时调用cancel），不由线程池删除
+        self.signals = WorkerSignals()
         self.cleaner_type = cleaner_type
         self.input_dir = input_dir
         self.output_dir = output_dir
-        self.is_cancelled = False
-        self.log_emitter = LogEmitter()  # 创建日志发射器
+        self.cancel_event = threading.Event()  # 协作式取消：清洗器在文件之间检查该事件
     
     def run(self):
-        """运行数据清洗任务，并重定向日志"""
-        # 设置日志处理器，用于实时捕获日志
-        handler = QtLogHandler(self.log_emitter)
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        handler.setFormatter(formatter)
-        logging.getLogger().addHandler(handler)
+        """运行数据清洗任务（日志由界面启动时安装的处理器统一捕获）"""
+        # 本次运行生成的所有输出文件共用同一时间戳
+        from excel_utils import start_batch, end_batch
+        start_batch()
         
         try:
-            self.progress_updated.emit(f"开始{self.cleaner_type}数据清洗...")
+            self.signals.progress_updated.emit(f"开始{self.cleaner_type}数据清洗...")
             
             if self.cleaner_type == "DC":
                 self._run_dc_cleaner()
@@ -78,74 +72,208 @@ class DataCleanerWorker(QThread):
             elif self.cleaner_type == "RG":
                 self._run_rg_cleaner()
             else:
-                self.error_occurred.emit("未知的清洗类型")
+                self.signals.error_occurred.emit("未知的清洗类型")
                 return
                 
         except Exception as e:
-            self.error_occurred.emit(f"清洗过程中发生错误: {str(e)}")
+            self.signals.error_occurred.emit(f"清洗过程中发生错误: {str(e)}")
         finally:
-            # 任务结束后移除处理器，避免重复记录
-            logging.getLogger().removeHandler(handler)
+            end_batch()
 
     def _run_dc_cleaner(self):
         """运行DC清洗器"""
         try:
-            # 日志现在由QtLogHandler自动捕获，无需在此处发送过多信号
-            cleaner = DCDataCleaner(input_dir=self.input_dir, output_dir=self.output_dir)
+            from dc_processing.dc_cleaner import DCDataCleaner
+            
+            # 日志现在由QueueHandler自动捕获，无需在此处发送过多信号
+            cleaner = DCDataCleaner(input_dir=self.input_dir, output_dir=self.output_dir,
+                                    cancel_event=self.cancel_event)
             success = cleaner.process_all_dc_files()
             
             if success:
-                self.finished.emit("DC数据清洗成功完成", True)
+                self.signals.finished.emit("DC数据清洗成功完成", True)
             else:
-                self.finished.emit("DC数据清洗失败，请查看日志信息", False)
+                self.signals.finished.emit("DC数据清洗失败，请查看日志信息", False)
                 
         except Exception as e:
-            self.error_occurred.emit(f"DC清洗器运行错误: {str(e)}")
+            self.signals.error_occurred.emit(f"DC清洗器运行错误: {str(e)}")
     
     def _run_dvds_cleaner(self):
         """运行DVDS清洗器"""
         try:
-            cleaner = DVDSCleaner(base_dir=str(Path(self.input_dir).parent.parent))
+            from dvds_processing.dvds_cleaner import DVDSCleaner
+            
+            cleaner = DVDSCleaner(base_dir=str(Path(self.input_dir).parent.parent),
+                                  cancel_event=self.cancel_event)
             cleaner.dvds_dir = self.input_dir
             cleaner.output_dir = self.output_dir
             output_file = cleaner.process_all()
             
             if output_file:
-                self.finished.emit(f"DVDS数据清洗成功完成\n输出文件: {os.path.basename(output_file)}", True)
+                self.signals.finished.emit(f"DVDS数据清洗成功完成\n输出文件: {os.path.basename(output_file)}", True)
             else:
-                self.finished.emit("DVDS数据清洗失败，请查看日志信息", False)
+                self.signals.finished.emit("DVDS数据清洗失败，请查看日志信息", False)
                 
         except Exception as e:
-            self.error_occurred.emit(f"DVDS清洗器运行错误: {str(e)}")
+            self.signals.error_occurred.emit(f"DVDS清洗器运行错误: {str(e)}")
     
     def _run_rg_cleaner(self):
         """运行RG清洗器"""
         try:
-            cleaner = RGCleaner(input_dir=self.input_dir, output_dir=self.output_dir)
+            from rg_processing.rg_cleaner import RGCleaner
+            
+            cleaner = RGCleaner(input_dir=self.input_dir, output_dir=self.output_dir,
+                                cancel_event=self.cancel_event)
             output_file = cleaner.run()
             
             if output_file:
-                self.finished.emit(f"RG数据清洗成功完成\n输出文件: {os.path.basename(output_file)}", True)
+                self.signals.finished.emit(f"RG数据清洗成功完成\n输出文件: {os.path.basename(output_file)}", True)
             else:
-                self.finished.emit("RG数据清洗失败，请查看日志信息", False)
+                self.signals.finished.emit("RG数据清洗失败，请查看日志信息", False)
                 
         except Exception as e:
-            self.error_occurred.emit(f"RG清洗器运行错误: {str(e)}")
+            self.signals.error_occurred.emit(f"RG清洗器运行错误: {str(e)}")
+    
+    @property
+    def is_cancelled(self):
+        """是否已请求取消"""
+        return self.cancel_event.is_set()
     
     def cancel(self):
-        """取消任务"""
-        self.is_cancelled = True
-        self.terminate()
+        """
+        请求取消任务
+        
+        不再强制终止线程（可能留下写了一半、无法打开的xlsx文件），
+        而是设置取消事件，由清洗器在文件之间和写入结果之前检查后自行退出。
+        """
+        self.cancel_event.set()
+
+
+# 界面样式（放大2倍字体），模块级常量，不在每次创建窗口时重新构造
+_STYLESHEET = """
+QMainWindow {
+    background-color: #f5f5f5;
+}
+QGroupBox {
+    font-weight: bold;
+    border: 2px solid #cccccc;
+    border-radius: 8px;
+    margin-top: 1em;
+    padding: 1em;
+    font-size: 32px;
+}
+QGroupBox::title {
+    subcontrol-origin: margin;
+    left: 10px;
+    padding: 0 5px 0 5px;
+}
+QPushButton {
+    background-color: #4CAF50;
+    color: white;
+    border: none;
+    padding: 10px 20px;
+    border-radius: 5px;
+    font-weight: bold;
+    font-size: 32px;
+}
+QPushButton:hover {
+    background-color: #45a049;
+}
+QPushButton:pressed {
+    background-color: #3d8b40;
+}
+QPushButton:disabled {
+    background-color: #cccccc;
+    color: #666666;
+}
+QLineEdit, QPlainTextEdit {
+    padding: 8px;
+    border: 1px solid #ddd;
+    border-radius: 5px;
+    font-size: 28px;
+}
+QRadioButton, QCheckBox {
+    spacing: 8px;
+    font-size: 32px;
+}
+QLabel {
+    font-size: 32px;
+    color: #333;
+}
+"""
+
+# 开始按钮特殊样式
+_START_BTN_STYLESHEET = """
+QPushButton {
+    background-color: #2196F3;
+    font-size: 40px;
+}
+QPushButton:hover {
+    background-color: #1976D2;
+}
+QPushButton:pressed {
+    background-color: #1565C0;
+}
+"""
 
 
 class FTDataCleanerGUI(QMainWindow):
     """FT数据清洗工具主界面"""
     
+    # 状态区域刷新间隔（毫秒），期间到达的日志合并为一次追加
+    LOG_FLUSH_INTERVAL_MS = 50
+    # 状态区域最多保留的行数
+    STATUS_MAX_LINES = 5000
+    # 需要显示到界面的logger（清洗器模块及公共Excel工具），第三方库的日志不转发
+    LOGGER_NAMES = ('dc_processing', 'dvds_processing', 'rg_processing', 'excel_utils')
+    
     def __init__(self):
         super().__init__()
-        self.worker_thread = None
+        self.worker = None
+        self._running = False
+        self._close_pending = False  # 用户已确认退出，等待清洗任务结束后关闭窗口
+        
+        # 日志先进入缓冲区，由定时器批量写入状态区域，避免每条日志都触发一次重新排版
+        # 缓冲区最多保留与状态区域相同的行数，窗口长时间最小化时也不会无限增长
+        self._log_buffer = deque(maxlen=self.STATUS_MAX_LINES)
+        self._setup_log_capture()
+        self._log_flush_timer = QTimer(self)
+        self._log_flush_timer.setInterval(self.LOG_FLUSH_INTERVAL_MS)
+        self._log_flush_timer.timeout.connect(self._flush_logs)  # 仅在清洗期间运行，空闲时不唤醒事件循环
+        
         self.init_ui()
         self.setup_default_paths()
+        
+        # 用户选择目录期间在后台预先导入pandas等重依赖，点击开始后无需再等待导入
+        threading.Thread(target=self._preload_modules, daemon=True).start()
+    
+    def _setup_log_capture(self):
+        """
+        启动时一次性安装日志处理器
+        
+        清洗线程只把日志记录放入队列，由GUI线程在刷新时取出（见_drain_log_queue），显示时再格式化。
+        处理器常驻，仅在清洗进行期间放行记录。logger保持向上传播，
+        各清洗器通过basicConfig配置的日志文件照常记录完整日志。
+        """
+        self._log_queue = queue.Queue(-1)
+        self._log_handler = RecordQueueHandler(self._log_queue)
+        self._log_handler.addFilter(lambda record: self._running)
+        
+        for name in self.LOGGER_NAMES:
+            logging.getLogger(name).addHandler(self._log_handler)
+    
+    def _set_log_level(self, verbose):
+        """按详细日志开关设置界面处理器的级别，低于该级别的记录不入队（不影响日志文件）"""
+        self._log_handler.setLevel(logging.INFO if verbose else logging.WARNING)
+    
+    @staticmethod
+    def _preload_modules():
+        """后台预加载清洗所需的公共模块"""
+        try:
+            import excel_utils  # noqa: F401  连带导入pandas、numpy
+        except Exception:
+            # 预加载失败不影响界面，真正开始清洗时会再次导入并报告错误
+            pass
     
     def init_ui(self):
         """初始化用户界面"""
@@ -202,16 +330,15 @@ class FTDataCleanerGUI(QMainWindow):
         
         # 默认选择DC
         self.dc_radio.setChecked(True)
+        self._cleaner_type = "DC"
         
         # 添加到按钮组
         self.cleaner_button_group.addButton(self.dc_radio)
         self.cleaner_button_group.addButton(self.dvds_radio)
         self.cleaner_button_group.addButton(self.rg_radio)
         
-        # 连接信号，当清洗类型改变时记录日志
-        self.dc_radio.toggled.connect(self.on_cleaner_type_changed)
-        self.dvds_radio.toggled.connect(self.on_cleaner_type_changed)
-        self.rg_radio.toggled.connect(self.on_cleaner_type_changed)
+        # 连接信号，当清洗类型改变时记录日志（按钮组每次点击只触发一次）
+        self.cleaner_button_group.buttonClicked.connect(self.on_cleaner_type_changed)
         
         # 添加到布局
         type_layout.addWidget(self.dc_radio)
@@ -219,6 +346,10 @@ class FTDataCleanerGUI(QMainWindow):
         type_layout.addWidget(self.rg_radio)
         type_layout.addStretch()
         
+        # 详细日志开关：默认只显示警告和错误，减少日志数量
+        self.verbose_cb = QCheckBox("详细日志")
+        type_layout.addWidget(self.verbose_cb)
+        
         main_layout.addWidget(type_group)
     
     def create_folder_selection_group(self, main_layout):
@@ -280,8 +411,13 @@ class FTDataCleanerGUI(QMainWindow):
         status_layout = QVBoxLayout(status_group)
         
         # 状态文本显示
-        self.status_text = QTextEdit()
+        # 纯文本控件 + 行数上限：超出后自动丢弃最早的行，长时间运行时追加开销和内存都保持稳定
+        self.status_text = QPlainTextEdit()
         self.status_text.setReadOnly(True)
+        self.status_text.setMaximumBlockCount(self.STATUS_MAX_LINES)
+        self.status_text.setUndoRedoEnabled(False)
+        # 等宽字体只设置一次（字号仍由样式表决定），追加日志时无需再解析字体
+        self.status_text.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
         self.status_text.setMinimumHeight(250) # 增大状态区域高度
         self.status_text.setPlaceholderText("等待用户操作...")
         
@@ -290,76 +426,16 @@ class FTDataCleanerGUI(QMainWindow):
     
     def set_styles(self):
         """设置界面样式（放大2倍字体）"""
-        self.setStyleSheet("""
-            QMainWindow {
-                background-color: #f5f5f5;
-            }
-            QGroupBox {
-                font-weight: bold;
-                border: 2px solid #cccccc;
-                border-radius: 8px;
-                margin-top: 1em;
-                padding: 1em;
-                font-size: 32px;
-            }
-            QGroupBox::title {
-                subcontrol-origin: margin;
-                left: 10px;
-                padding: 0 5px 0 5px;
-            }
-            QPushButton {
-                background-color: #4CAF50;
-                color: white;
-                border: none;
-                padding: 10px 20px;
-                border-radius: 5px;
-                font-weight: bold;
-                font-size: 32px;
-            }
-            QPushButton:hover {
-                background-color: #45a049;
-            }
-            QPushButton:pressed {
-                background-color: #3d8b40;
-            }
-            QPushButton:disabled {
-                background-color: #cccccc;
-                color: #666666;
-            }
-            QLineEdit, QTextEdit {
-                padding: 8px;
-                border: 1px solid #ddd;
-                border-radius: 5px;
-                font-size: 28px;
-            }
-            QRadioButton {
-                spacing: 8px;
-                font-size: 32px;
-            }
-            QLabel {
-                font-size: 32px;
-                color: #333;
-            }
-        """)
+        self.setStyleSheet(_STYLESHEET)
         
         # 设置开始按钮特殊样式
-        self.start_btn.setStyleSheet("""
-            QPushButton {
-                background-color: #2196F3;
-                font-size: 40px;
-            }
-            QPushButton:hover {
-                background-color: #1976D2;
-            }
-            QPushButton:pressed {
-                background-color: #1565C0;
-            }
-        """)
+        self.start_btn.setStyleSheet(_START_BTN_STYLESHEET)
     
     def setup_default_paths(self):
         """设置默认路径"""
         # 获取Windows桌面路径
         desktop_path = os.path.join(os.path.expanduser("~"), "Desktop")
+        self._desktop = desktop_path  # 浏览文件夹时复用，无需再次解析
         
         # 设置默认路径为桌面
         self.input_path_edit.setText(desktop_path)
@@ -373,7 +449,7 @@ class FTDataCleanerGUI(QMainWindow):
         folder = QFileDialog.getExistingDirectory(
             self, 
             "选择包含源数据的文件夹",
-            self.input_path_edit.text() or os.path.expanduser("~/Desktop")
+            self.input_path_edit.text() or self._desktop
         )
         if folder:
             self.input_path_edit.setText(folder)
@@ -384,7 +460,7 @@ class FTDataCleanerGUI(QMainWindow):
         folder = QFileDialog.getExistingDirectory(
             self, 
             "选择输出文件夹",
-            self.output_path_edit.text() or os.path.expanduser("~/Desktop")
+            self.output_path_edit.text() or self._desktop
         )
         if folder:
             self.output_path_edit.setText(folder)
@@ -392,20 +468,16 @@ class FTDataCleanerGUI(QMainWindow):
     
     def get_selected_cleaner_type(self):
         """获取选中的清洗类型"""
-        if self.dc_radio.isChecked():
-            return "DC"
-        elif self.dvds_radio.isChecked():
-            return "DVDS"
-        elif self.rg_radio.isChecked():
-            return "RG"
-        return None
-    
-    def on_cleaner_type_changed(self):
+        return self._cleaner_type
+    
+    def on_cleaner_type_changed(self, button):
         """当清洗类型改变时记录日志"""
-        cleaner_type = self.get_selected_cleaner_type()
-        if cleaner_type:
-            self.log_message(f"切换到{cleaner_type}清洗模式")
-            self.log_message(f"请选择包含ASEData/{cleaner_type}文件夹的目录")
+        cleaner_type = button.text()
+        if cleaner_type == self._cleaner_type:
+            return
+        self._cleaner_type = cleaner_type
+        self.log_message(f"切换到{cleaner_type}清洗模式")
+        self.log_message(f"请选择包含ASEData/{cleaner_type}文件夹的目录")
     
     def start_cleaning(self):
         """开始数据清洗过程"""
@@ -434,15 +506,20 @@ class FTDataCleanerGUI(QMainWindow):
         self.start_btn.setText("清洗中...")
         
         # 清空状态显示
+        self._log_buffer.clear()
         self.status_text.clear()
         
-        # 创建并启动工作线程
-        self.worker_thread = DataCleanerWorker(cleaner_type, input_dir, output_dir)
-        self.worker_thread.log_emitter.log_received.connect(self.log_message_from_cleaner)
-        self.worker_thread.progress_updated.connect(self.update_progress)
-        self.worker_thread.finished.connect(self.cleaning_finished)
-        self.worker_thread.error_occurred.connect(self.cleaning_error)
-        self.worker_thread.start()
+        # 开始捕获清洗日志
+        self._set_log_level(self.verbose_cb.isChecked())
+        self._running = True
+        self._log_flush_timer.start()
+        
+        # 创建清洗任务并提交到线程池
+        self.worker = DataCleanerWorker(cleaner_type, input_dir, output_dir)
+        self.worker.signals.progress_updated.connect(self.update_progress)
+        self.worker.signals.finished.connect(self.cleaning_finished)
+        self.worker.signals.error_occurred.connect(self.cleaning_error)
+        QThreadPool.globalInstance().start(self.worker)
     
     def validate_inputs(self):
         """验证输入参数"""
@@ -464,22 +541,23 @@ class FTDataCleanerGUI(QMainWindow):
         """更新GUI发出的进度信息"""
         self.log_message(message)
     
-    def log_message_from_cleaner(self, message):
-        """直接从日志处理器接收消息并显示"""
-        self.status_text.append(message)
-        
-        # 自动滚动到底部
-        scrollbar = self.status_text.verticalScrollBar()
-        scrollbar.setValue(scrollbar.maximum())
-    
     def cleaning_finished(self, message, success):
         """清洗完成"""
+        self._running = False
         self.log_message(f"🎉 {message}")
         
         # 恢复开始按钮
         self.start_btn.setEnabled(True)
         self.start_btn.setText("🚀 开始清洗数据")
         
+        # 弹出对话框前先显示缓冲区中的剩余日志，并停止定时刷新
+        self._flush_logs()
+        self._log_flush_timer.stop()
+        
+        if self._close_pending:
+            self.close()
+            return
+        
         # 显示结果消息
         if success:
             QMessageBox.information(self, "成功", message)
@@ -488,48 +566,112 @@ class FTDataCleanerGUI(QMainWindow):
     
     def cleaning_error(self, error_message):
         """清洗出错"""
+        self._running = False
         self.log_message(f"错误: {error_message}")
         
         # 恢复开始按钮
         self.start_btn.setEnabled(True)
         self.start_btn.setText("🚀 开始清洗数据")
         
+        # 弹出对话框前先显示缓冲区中的剩余日志，并停止定时刷新
+        self._flush_logs()
+        self._log_flush_timer.stop()
+        
+        if self._close_pending:
+            self.close()
+            return
+        
         # 显示错误消息
         QMessageBox.critical(self, "错误", error_message)
     
+    def _drain_log_queue(self):
+        """
+        在GUI线程中把队列里已有的日志记录同步转入缓冲区
+        
+        不依赖后台线程转交，清洗结束时所有已入队的记录都会在结束消息之前进入缓冲区。
+        """
+        while True:
+            try:
+                self._log_buffer.append(self._log_queue.get_nowait())
+            except queue.Empty:
+                break
+    
     def log_message(self, message):
         """记录GUI本身发出的消息到状态显示区域"""
+        # 先转入已入队的清洗日志，保证界面消息排在它们之后
+        self._drain_log_queue()
         timestamp = datetime.now().strftime("%H:%M:%S")
-        formatted_message = f"[{timestamp}] {message}"
-        self.status_text.append(formatted_message)
+        self._log_buffer.append(f"[{timestamp}] {message}")
+        # 空闲时没有定时刷新，界面自身的消息立即显示
+        if not self._log_flush_timer.isActive():
+            self._flush_logs()
+    
+    def _flush_logs(self):
+        """将缓冲区中的日志一次性追加到状态显示区域"""
+        self._drain_log_queue()
+        if not self._log_buffer:
+            return
+        # 窗口最小化或状态区域不可见时只累积日志，恢复显示时再一次性写入
+        if self.isMinimized() or not self.status_text.isVisible():
+            return
         
-        # 自动滚动到底部
-        scrollbar = self.status_text.verticalScrollBar()
-        scrollbar.setValue(scrollbar.maximum())
+        entries = []
+        while self._log_buffer:
+            entries.append(self._log_buffer.popleft())
+        
+        # 超出行数上限的部分显示后也会被立即淘汰，只格式化最后保留的部分
+        messages = [entry if isinstance(entry, str) else LOG_FORMATTER.format(entry)
+                    for entry in entries[-self.STATUS_MAX_LINES:]]
+        # 光标位于末尾时appendPlainText会自动滚动到底部
+        self.status_text.appendPlainText("\n".join(messages))
+    
+    def showEvent(self, event):
+        """窗口显示（包括从最小化恢复）时立即写入累积的日志"""
+        super().showEvent(event)
+        self._flush_logs()
     
     def closeEvent(self, event):
         """窗口关闭事件"""
-        if self.worker_thread and self.worker_thread.isRunning():
-            reply = QMessageBox.question(
-                self, 
-                "确认", 
-                "数据清洗正在进行中，确定要退出吗？",
-                QMessageBox.Yes | QMessageBox.No,
-                QMessageBox.No
-            )
-            
-            if reply == QMessageBox.Yes:
-                self.worker_thread.cancel()
-                self.worker_thread.wait(3000)  # 等待3秒
-                event.accept()
-            else:
-                event.ignore()
+        if self._running:
+            # 已确认退出、正在等待取消完成时再次关闭，不重复询问
+            if not self._close_pending:
+                reply = QMessageBox.question(
+                    self, 
+                    "确认", 
+                    "数据清洗正在进行中，确定要退出吗？",
+                    QMessageBox.Yes | QMessageBox.No,
+                    QMessageBox.No
+                )
+                if reply == QMessageBox.Yes:
+                    if not self._running:
+                        # 询问期间任务已经结束，直接退出
+                        event.accept()
+                        return
+                    self._request_close()
+            event.ignore()
         else:
             event.accept()
+    
+    def _request_close(self):
+        """
+        请求取消清洗，任务结束后再关闭窗口
+        
+        清洗器只在文件之间和写入结果前检查取消，正在写入的输出文件无法中断，
+        因此不在GUI线程中阻塞等待（窗口会失去响应），而是禁用界面并提示正在取消，
+        由cleaning_finished/cleaning_error在任务结束后关闭窗口。
+        """
+        self._close_pending = True
+        self.worker.cancel()
+        self.centralWidget().setEnabled(False)
+        self.log_message("正在取消…当前文件处理完成后将自动退出")
 
 
 def main():
     """主函数"""
+    # 高分辨率屏幕上图标等位图使用高清版本，避免软件放大（须在创建QApplication之前设置）
+    # 未开启AA_EnableHighDpiScaling：样式表中的字号按物理像素设定，开启后会被再次放大
+    QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps)
+    
     # 创建应用程序
     app = QApplication(sys.argv)
     
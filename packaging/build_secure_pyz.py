@@ -7,11 +7,16 @@ FT数据清洗工具 - 安全打包脚本 (PYZ格式)
 创建时间：2025-01-20
 """
 
-import zipapp
+import argparse
+import logging
 import os
-import shutil
+import sys
+import stat
+import zipfile
 import glob
 import fnmatch
+import re
+from collections import deque
 from pathlib import Path
 
 # --- 配置 ---
@@ -21,6 +26,17 @@ source_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 target_file = os.path.join(os.path.dirname(__file__), 'release', 'ft_data_cleaner.pyz')
 # 打包的入口点
 main_entry_point = 'gui.ft_data_cleaner_gui:main'
+# .pyz 文件首行的解释器
+interpreter = '/usr/bin/env python'
+# 压缩包内 __main__.py 的内容（与zipapp生成的相同）
+MAIN_TEMPLATE = """\
+# -*- coding: utf-8 -*-
+import {module}
+{module}.{fn}()
+"""
+# 逐个文件的明细通过logger输出（默认不显示，--verbose时显示），控制台只打印汇总信息
+logger = logging.getLogger(__name__)
+
 # 需要包含在 .pyz 文件中的顶层目录
 packages_to_include = ['dc_processing', 'dvds_processing', 'rg_processing', 'gui']
 # 需要包含在 .pyz 文件中的根目录下的 .py 文件
@@ -53,6 +69,12 @@ EXCLUDE_PATTERNS = [
     'packaging/',     # 打包目录本身
 ]
 
+# 预编译排除规则：通配模式合并为一个正则（与fnmatch一样按os.path.normcase比较），其余按子串匹配
+_EXCLUDE_GLOB_RE = re.compile('|'.join(
+    fnmatch.translate(os.path.normcase(pattern)) for pattern in EXCLUDE_PATTERNS if '*' in pattern
+))
+_EXCLUDE_LITERALS = tuple(pattern for pattern in EXCLUDE_PATTERNS if '*' not in pattern)
+
 def should_exclude_file(file_path):
     """检查文件是否应该被排除"""
     file_name = os.path.basename(file_path)
@@ -62,120 +84,115 @@ def should_exclude_file(file_path):
     if file_name == 'requirements.txt':
         return False
     
-    # 检查排除模式
-    for pattern in EXCLUDE_PATTERNS:
-        if '*' in pattern:
-            if fnmatch.fnmatch(file_name, pattern) or fnmatch.fnmatch(rel_path, pattern):
-                return True
-        elif pattern in file_name or pattern in rel_path:
-            return True
+    # 检查通配模式
+    if (_EXCLUDE_GLOB_RE.match(os.path.normcase(file_name))
+            or _EXCLUDE_GLOB_RE.match(os.path.normcase(rel_path))):
+        return True
     
-    return False
+    # 检查子串模式（文件名是相对路径的结尾部分，只需检查相对路径）
+    return any(pattern in rel_path for pattern in _EXCLUDE_LITERALS)
 
-def copy_directory_filtered(src, dst):
-    """复制目录，但过滤掉敏感文件"""
-    if not os.path.exists(dst):
-        os.makedirs(dst)
-    
+def collect_package_files(src):
+    """遍历目录，过滤掉敏感文件
+
+    Returns:
+        (需要打包的目录路径列表, 需要打包的文件路径列表, 排除的文件数)
+    """
+    included_dirs = []
+    included_files = []
     excluded_count = 0
-    included_count = 0
     
-    for root, dirs, files in os.walk(src):
-        # 过滤目录
-        dirs[:] = [d for d in dirs if not should_exclude_file(os.path.join(root, d))]
-        
-        for file in files:
-            src_file = os.path.join(root, file)
-            
-            if should_exclude_file(src_file):
-                excluded_count += 1
-                print(f"  ❌ 排除敏感文件: {os.path.relpath(src_file, src)}")
-                continue
-            
-            # 计算目标路径
-            rel_path = os.path.relpath(src_file, src)
-            dst_file = os.path.join(dst, rel_path)
-            
-            # 确保目标目录存在
-            os.makedirs(os.path.dirname(dst_file), exist_ok=True)
-            
-            # 复制文件
-            shutil.copy2(src_file, dst_file)
-            included_count += 1
+    # 用os.scandir遍历，直接使用目录项缓存的类型信息，不再对每个条目单独stat
+    pending_dirs = deque([src])
+    while pending_dirs:
+        current_dir = pending_dirs.popleft()
+        # 目录项也要写入压缩包，否则无__init__.py的包（如gui）无法从压缩包导入
+        included_dirs.append(current_dir)
+        with os.scandir(current_dir) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    # 过滤目录
+                    if not should_exclude_file(entry.path):
+                        pending_dirs.append(entry.path)
+                    continue
+                
+                if should_exclude_file(entry.path):
+                    excluded_count += 1
+                    logger.debug("  ❌ 排除敏感文件: %s", os.path.relpath(entry.path, src))
+                    continue
+                
+                included_files.append(entry.path)
     
-    return included_count, excluded_count
+    return included_dirs, included_files, excluded_count
 
 def create_secure_archive():
-    """创建安全的 ft_data_cleaner.pyz 文件（排除敏感信息）"""
-    
-    # 临时的打包源目录
-    temp_source_dir = os.path.join(os.path.dirname(__file__), '_temp_secure_build_src')
-    
+    """创建安全的 ft_data_cleaner.pyz 文件（排除敏感信息）
+
+    源文件直接写入压缩包，不再先复制到临时目录再由zipapp打包，每个文件只读取一次。
+    """
     # 确保release目录存在
     release_dir = os.path.dirname(target_file)
     os.makedirs(release_dir, exist_ok=True)
 
-    # 清理旧的临时目录和目标文件
-    if os.path.exists(temp_source_dir):
-        shutil.rmtree(temp_source_dir)
+    # 清理旧的目标文件
     if os.path.exists(target_file):
         os.remove(target_file)
         print(f"已删除旧的 {os.path.basename(target_file)}")
 
-    os.makedirs(temp_source_dir, exist_ok=True)
-    print(f"创建临时目录: {temp_source_dir}")
-
     total_included = 0
     total_excluded = 0
 
-    # --- 拷贝必要的包到临时目录（带过滤） ---
-    for package_name in packages_to_include:
-        src_path = os.path.join(source_root, package_name)
-        if os.path.isdir(src_path):
-            dest_path = os.path.join(temp_source_dir, package_name)
-            print(f"🔍 正在过滤并拷贝 {package_name}...")
-            included, excluded = copy_directory_filtered(src_path, dest_path)
-            total_included += included
-            total_excluded += excluded
-            print(f"  ✅ {package_name}: 包含 {included} 个文件，排除 {excluded} 个敏感文件")
-        else:
-            print(f"警告: 找不到目录 {package_name}，跳过。")
+    print(f"\n🔒 正在创建安全的压缩包...")
+    module_name, function_name = main_entry_point.split(':')
+    
+    with open(target_file, 'wb') as fd:
+        # 与zipapp相同：解释器行 + zip内容，入口为__main__.py
+        fd.write(b'#!' + interpreter.encode(sys.getfilesystemencoding()) + b'\n')
+        # 只能用ZIP_DEFLATED：zipimport不支持LZMA/BZIP2压缩的条目，.pyz将无法运行；
+        # 发布包只打包一次，使用最高压缩级别
+        with zipfile.ZipFile(fd, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=9) as zf:
+            zf.writestr('__main__.py', MAIN_TEMPLATE.format(module=module_name, fn=function_name))
             
-    # --- 拷贝必要的 .py 文件到临时目录 ---
-    for file_name in files_to_include:
-        src_path = os.path.join(source_root, file_name)
-        if os.path.isfile(src_path):
-            if should_exclude_file(src_path):
-                print(f"  ❌ 排除敏感文件: {file_name}")
-                total_excluded += 1
-                continue
+            # --- 写入必要的包（带过滤） ---
+            for package_name in packages_to_include:
+                src_path = os.path.join(source_root, package_name)
+                if os.path.isdir(src_path):
+                    print(f"🔍 正在过滤并写入 {package_name}...")
+                    included_dirs, included_files, excluded = collect_package_files(src_path)
+                    for src_entry in included_dirs + included_files:
+                        zf.write(src_entry, arcname=os.path.relpath(src_entry, source_root))
+                    total_included += len(included_files)
+                    total_excluded += excluded
+                    print(f"  ✅ {package_name}: 包含 {len(included_files)} 个文件，排除 {excluded} 个敏感文件")
+                else:
+                    print(f"警告: 找不到目录 {package_name}，跳过。")
             
-            dest_path = os.path.join(temp_source_dir, file_name)
-            shutil.copy2(src_path, dest_path)
-            print(f"  ✅ 已拷贝 {file_name}")
-            total_included += 1
-        else:
-            print(f"警告: 找不到文件 {file_name}，跳过。")
+            # --- 写入必要的 .py 文件 ---
+            for file_name in files_to_include:
+                src_path = os.path.join(source_root, file_name)
+                if os.path.isfile(src_path):
+                    if should_exclude_file(src_path):
+                        logger.debug("  ❌ 排除敏感文件: %s", file_name)
+                        total_excluded += 1
+                        continue
+                    
+                    zf.write(src_path, arcname=file_name)
+                    logger.debug("  ✅ 已写入 %s", file_name)
+                    total_included += 1
+                else:
+                    print(f"警告: 找不到文件 {file_name}，跳过。")
+            
+            # --- 写入requirements.txt ---
+            requirements_src = os.path.join(source_root, 'requirements.txt')
+            if os.path.isfile(requirements_src):
+                zf.write(requirements_src, arcname='requirements.txt')
+                logger.debug("  ✅ 已写入 requirements.txt")
+                total_included += 1
+
+    # 与zipapp相同：设置可执行权限
+    os.chmod(target_file, os.stat(target_file).st_mode | stat.S_IEXEC)
     
-    # --- 拷贝requirements.txt ---
-    requirements_src = os.path.join(source_root, 'requirements.txt')
-    if os.path.isfile(requirements_src):
-        requirements_dest = os.path.join(temp_source_dir, 'requirements.txt')
-        shutil.copy2(requirements_src, requirements_dest)
-        print(f"  ✅ 已拷贝 requirements.txt")
-        total_included += 1
-
-    # --- 创建 .pyz 文件 ---
-    print(f"\n🔒 正在创建安全的压缩包...")
     print(f"📊 统计: 包含 {total_included} 个文件，排除 {total_excluded} 个敏感文件")
-    
-    zipapp.create_archive(
-        source=temp_source_dir,
-        target=target_file,
-        interpreter='/usr/bin/env python',
-        main=main_entry_point,
-        compressed=True
-    )
     print(f"🎉 成功创建安全版本: {target_file}")
 
     # 显示文件大小
@@ -183,10 +200,6 @@ def create_secure_archive():
         file_size = os.path.getsize(target_file)
         print(f"📁 文件大小: {file_size:,} bytes ({file_size / (1024*1024):.2f} MB)")
 
-    # --- 清理临时目录 ---
-    shutil.rmtree(temp_source_dir)
-    print(f"🧹 已删除临时目录: {temp_source_dir}")
-
 def create_usage_instructions():
     """创建使用说明文件"""
     usage_file = os.path.join(os.path.dirname(target_file), 'USAGE.txt')
@@ -218,6 +231,11 @@ def create_usage_instructions():
     print(f"📝 已创建使用说明: {usage_file}")
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="创建FT数据清洗工具安全版本")
+    parser.add_argument('--verbose', action='store_true', help="显示每个文件的包含/排除明细")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format='%(message)s')
+    
     print("🛡️  开始创建FT数据清洗工具安全版本...")
     print("=" * 60)
     create_secure_archive()
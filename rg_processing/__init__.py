@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""RG数据清洗包"""
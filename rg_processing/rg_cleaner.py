@@ -5,31 +5,54 @@ RG数据清洗主程序
 """
 
 import pandas as pd
+import numpy as np
 import re
 from pathlib import Path
 from datetime import datetime
 import logging
 import sys
 
-# 添加项目根目录到路径
-project_root = Path(__file__).parent.parent
-sys.path.append(str(project_root))
+# 作为脚本直接运行时，将项目根目录添加到路径以便导入excel_utils；作为包导入时不修改sys.path
+if __name__ == "__main__":
+    sys.path.append(str(Path(__file__).parent.parent))
+
+from excel_utils import (generate_lot_based_filename, read_sheet_rows, write_excel_streaming,
+                         map_files_parallel, FileResultCache, CancellableMixin,
+                         get_performance_stats)
+
+# 表头区域的行数：RG标识、单位和Test No.行都位于工作表开头，只在这些行中查找
+HEADER_SCAN_ROWS = 30
+
+# R单位的匹配模式：独立的R，或"数值 + 空格 + R"（如"4.600 R"）
+_R_WORD_RE = re.compile(r'\bR\b')
+_NUM_R_RE = re.compile(r'^\d+\.\d+\s+R$')
 
-from excel_utils import generate_lot_based_filename
+# 批次号模式，形如FA4Z-2484（4个字母数字 + 短横线 + 4个数字）
+_LOT_RE = re.compile(r'[A-Z0-9]{4}-[0-9]{4}')
 
-class RGCleaner:
+# 单文件提取结果的缓存版本号，修改extract_rg_data的输出时需要递增
+CACHE_VERSION = 1
+
+class RGCleaner(CancellableMixin):
     """RG数据清洗器"""
     
-    def __init__(self, input_dir="../ASEData/RG", output_dir="../output"):
+    def __init__(self, input_dir="../ASEData/RG", output_dir="../output", max_workers=None,
+                 cache_dir=None, cancel_event=None):
         """
         初始化RG清洗器
         
         Args:
             input_dir: RG源数据目录
             output_dir: 输出目录
+            max_workers: 并行提取文件的最大进程数，None表示使用CPU核心数，1表示串行
+            cache_dir: 单文件提取结果的缓存目录，None表示不使用缓存
+            cancel_event: 可选的取消事件（threading.Event），设置后在文件之间停止处理
         """
         self.input_dir = Path(input_dir)
         self.output_dir = Path(output_dir)
+        self.max_workers = max_workers
+        self.cache_dir = cache_dir
+        self.cancel_event = cancel_event
         self.setup_logging()
         
     def setup_logging(self):
@@ -61,42 +84,56 @@ class RGCleaner:
             
         return xlsx_files
     
-    def locate_rg_header(self, df):
-        """定位RG标识的位置 - 在第2行中动态寻找RG列"""
+    def locate_rg_header(self, header_rows):
+        """定位RG标识的位置 - 在第2行中动态寻找RG列
+        
+        Args:
+            header_rows: 工作表开头的若干行（行元组列表）；只有字符串单元格可能是RG标识
+        """
         target_row = 1  # 第2行（0-based索引）
         
+        def find_rg_col(row):
+            """返回行中第一个RG标识（不区分大小写）的列索引"""
+            return next((j for j, value in enumerate(row)
+                         if isinstance(value, str) and value.strip().upper() == "RG"), None)
+        
         # 在第2行中寻找"RG"标识
-        if target_row < len(df):
-            for j in range(len(df.columns)):
-                cell_value = str(df.iloc[target_row, j]).strip()
-                if cell_value.upper() == "RG":  # 不区分大小写
-                    return (target_row, j)  # 返回0-based索引
+        if target_row < len(header_rows):
+            rg_col = find_rg_col(header_rows[target_row])
+            if rg_col is not None:
+                return (target_row, rg_col)  # 返回0-based索引
         
         # 容错：如果第2行没找到，在前5行中寻找
-        for i in range(min(5, len(df))):
-            for j in range(len(df.columns)):
-                cell_value = str(df.iloc[i, j]).strip()
-                if cell_value.upper() == "RG":
-                    return (i, j)
+        for i, row in enumerate(header_rows[:5]):
+            rg_col = find_rg_col(row)
+            if rg_col is not None:
+                return (i, rg_col)
         
         return None
     
-    def locate_r_unit(self, df, rg_col):
-        """基于RG列位置定位R单位标识 - 在unit行（第7行）与RG列交叉位置查找"""
+    def locate_r_unit(self, header_rows, rg_col):
+        """基于RG列位置定位R单位标识 - 在unit行（第7行）与RG列交叉位置查找
+        
+        Args:
+            header_rows: 工作表开头的若干行（行元组列表）；只有字符串单元格可能是R单位
+            rg_col: RG列索引（0-based）
+        """
         unit_row = 6  # 第7行（0-based索引）
         
         # 首先在第7行与RG列交叉位置查找
-        if unit_row < len(df) and rg_col < len(df.columns):
-            cell_value = str(df.iloc[unit_row, rg_col]).strip()
-            # 匹配包含数值+空格+R的格式，或包含"R"的内容
-            if re.search(r'\bR\b', cell_value) or re.match(r'^\d+\.\d+\s+R$', cell_value):
-                return (unit_row, rg_col)
+        if unit_row < len(header_rows) and rg_col < len(header_rows[unit_row]):
+            value = header_rows[unit_row][rg_col]
+            if isinstance(value, str):
+                cell_value = value.strip()
+                # 匹配包含数值+空格+R的格式，或包含"R"的内容
+                if _R_WORD_RE.search(cell_value) or _NUM_R_RE.match(cell_value):
+                    return (unit_row, rg_col)
         
         # 容错：在RG列的前10行中查找包含R单位的内容
-        for i in range(min(10, len(df))):
-            cell_value = str(df.iloc[i, rg_col]).strip()
-            if re.match(r'^\d+\.\d+\s+R$', cell_value):
-                return (i, rg_col)
+        for i, row in enumerate(header_rows[:10]):
+            if rg_col < len(row) and isinstance(row[rg_col], str):
+                if _NUM_R_RE.match(row[rg_col].strip()):
+                    return (i, rg_col)
         
         return None
     
@@ -110,13 +147,12 @@ class RGCleaner:
         Returns:
             str: 批次字符串（使用正则表达式提取FA4Z-2484这样的模式）
         """
-        # 使用正则表达式提取形如FA4Z-2484的模式（4个字母数字 + 短横线 + 4个数字）
-        pattern = r'[A-Z0-9]{4}-[0-9]{4}'
-        match = re.search(pattern, filename)
+        # 使用预编译的正则表达式提取形如FA4Z-2484的模式
+        match = _LOT_RE.search(filename)
         
         if match:
             lot_id = match.group()
-            self.logger.debug(f"提取批次信息: {filename} -> {lot_id}")
+            self.logger.debug("提取批次信息: %s -> %s", filename, lot_id)
             return lot_id
         else:
             # 如果正则匹配失败，回退到使用完整文件名
@@ -125,60 +161,58 @@ class RGCleaner:
             return lot_id
     
     def extract_rg_data(self, file_path):
-        """从单个xlsx文件中提取RG数据"""
+        """从单个xlsx文件中提取RG数据，未提取到有效数据或出错时返回None"""
         self.logger.info(f"处理文件: {file_path.name}")
         
         try:
-            # 读取Excel文件 - 使用calamine引擎提升读取速度
-            df = pd.read_excel(file_path, header=None, engine='calamine')
+            # 读取Excel文件 - 直接读取原始行（calamine，失败时回退openpyxl只读模式），不构建DataFrame
+            rows = read_sheet_rows(file_path)
+            header_rows = rows[:HEADER_SCAN_ROWS]  # 表头区域只切片一次，供各定位步骤共用
             
             # 1. 定位RG标识
-            rg_pos = self.locate_rg_header(df)
+            rg_pos = self.locate_rg_header(header_rows)
             if not rg_pos:
                 self.logger.warning(f"文件 {file_path.name} 中未找到RG标识")
-                return pd.DataFrame()
+                return None
             
             rg_row, rg_col = rg_pos
             self.logger.info(f"  RG标识位置: 第{rg_row+1}行, 第{rg_col+1}列")
             
             # 2. 验证R单位
-            r_unit_pos = self.locate_r_unit(df, rg_col)
+            r_unit_pos = self.locate_r_unit(header_rows, rg_col)
             if r_unit_pos:
                 r_row, r_col = r_unit_pos
                 self.logger.info(f"  R单位位置: 第{r_row+1}行, 第{r_col+1}列")
             
             # 3. 找到数据起始行（Test No.行）
-            test_no_row = None
-            for i in range(len(df)):
-                for j in range(len(df.columns)):
-                    cell_value = str(df.iloc[i, j]).strip()
-                    if "Test No" in cell_value:
-                        test_no_row = i
-                        break
-                if test_no_row is not None:
-                    break
+            test_no_row = next(
+                (i for i, row in enumerate(header_rows)
+                 if any(isinstance(value, str) and "Test No" in value for value in row)),
+                None
+            )
             
             if test_no_row is None:
                 self.logger.warning(f"文件 {file_path.name} 中未找到Test No.行")
-                return pd.DataFrame()
+                return None
             
             self.logger.info(f"  数据起始行: 第{test_no_row+2}行")
             
             # 4. 提取RG数据
-            rg_values = []
             data_start_row = test_no_row + 1
-            
-            for i in range(data_start_row, len(df)):
-                value = df.iloc[i, rg_col]
-                if pd.notna(value) and isinstance(value, (int, float)):
-                    rg_values.append(value)
-                elif pd.notna(value):
-                    # 尝试转换字符串为数值
-                    try:
-                        numeric_value = float(str(value).strip())
-                        rg_values.append(numeric_value)
-                    except ValueError:
-                        continue  # 跳过非数值数据
+            data_rows = rows[data_start_row:]
+            try:
+                # 行数已知，直接逐个填入预分配的float64数组（空值转为NaN），不经过中间列表
+                rg_values = np.fromiter((row[rg_col] if rg_col < len(row) else None for row in data_rows),
+                                        dtype=np.float64, count=len(data_rows))
+                # 纯数值列（常见情况）无需筛选，只有存在空值时才复制出非空部分
+                valid = ~np.isnan(rg_values)
+                if not valid.all():
+                    rg_values = rg_values[valid]
+            except (TypeError, ValueError):
+                # 列中含有无法转换的文本等数据时，回退到逐值转换，非数值数据转为NaN后丢弃
+                raw_values = pd.Series([row[rg_col] if rg_col < len(row) else None
+                                        for row in data_rows], dtype=object)
+                rg_values = pd.to_numeric(raw_values, errors='coerce').dropna().to_numpy(dtype=float)
             
             self.logger.info(f"  提取到 {len(rg_values)} 个RG数据点")
             
@@ -186,34 +220,46 @@ class RGCleaner:
             lot_id = self.extract_lot_id(file_path.name)
             
             # 6. 创建结果DataFrame
-            if rg_values:
+            if len(rg_values):
                 result_df = pd.DataFrame({
-                    'lot_ID': [lot_id] * len(rg_values),
+                    'lot_ID': lot_id,
                     'RG(R)': rg_values
                 })
                 return result_df
             else:
                 self.logger.warning(f"文件 {file_path.name} 中未提取到有效的RG数据")
-                return pd.DataFrame()
+                return None
                 
         except Exception as e:
             self.logger.error(f"处理文件 {file_path.name} 时出错: {e}")
-            return pd.DataFrame()
+            return None
     
     def merge_all_rg_data(self, file_list):
         """合并所有文件的RG数据"""
         self.logger.info("开始合并所有RG数据")
         
-        all_data = []
+        # 各文件相互独立，并行提取；未变化的文件直接读取缓存
+        cache = FileResultCache(self.cache_dir, 'RG', CACHE_VERSION) if self.cache_dir else None
+        results = map_files_parallel(self.extract_rg_data, file_list, self.max_workers,
+                                     cache=cache, cancel_event=self.cancel_event)
+        if self.is_cancelled():
+            return pd.DataFrame()
         
-        for file_path in file_list:
-            file_data = self.extract_rg_data(file_path)
-            if not file_data.empty:
-                all_data.append(file_data)
+        all_data = [file_data for file_data in results if file_data is not None]
         
         if all_data:
-            # 合并所有数据
-            merged_df = pd.concat(all_data, ignore_index=True)
+            # 合并所有数据：每个文件只有一个lot_ID，直接拼接数值数组并按行数重复lot_ID，
+            # 只构建一次最终的DataFrame，不经过pd.concat
+            counts = [len(file_data) for file_data in all_data]
+            # lot_ID只有少数几个不同值，存为分类类型：每行只占一个整数编码
+            lot_categories = {}
+            file_codes = [lot_categories.setdefault(file_data['lot_ID'].iat[0], len(lot_categories))
+                          for file_data in all_data]
+            lot_codes = np.repeat(np.array(file_codes, dtype=np.int32), counts)
+            merged_df = pd.DataFrame({
+                'lot_ID': pd.Categorical.from_codes(lot_codes, categories=list(lot_categories)),
+                'RG(R)': np.concatenate([file_data['RG(R)'].to_numpy() for file_data in all_data]),
+            })
             self.logger.info(f"合并完成，总共 {len(merged_df)} 条RG数据")
             return merged_df
         else:
@@ -227,22 +273,20 @@ class RGCleaner:
         if df.empty:
             return df
         
-        # 1. 生成连续的NUM编号
-        df['NUM'] = range(1, len(df) + 1)
-        
-        # 2. 重新排列列顺序
-        df = df[['NUM', 'lot_ID', 'RG(R)']]
-        
-        # 3. 数据清洗
         original_count = len(df)
         
-        # 过滤掉异常的RG值（如负数、过大的值等）
-        df = df[df['RG(R)'] > 0]  # RG阻值应该大于0
-        df = df[df['RG(R)'] < 1000]  # 过滤掉异常大的值
+        # 1. 数据清洗：过滤掉异常的RG值，RG阻值应该大于0且小于1000（一次组合掩码完成）
+        rg_values = df['RG(R)'].to_numpy()
+        mask = (rg_values > 0) & (rg_values < 1000)
+        if not mask.all():
+            df = df[mask]
         
-        # 重新生成NUM编号
-        df = df.reset_index(drop=True)
-        df['NUM'] = range(1, len(df) + 1)
+        # 2. 按输出列顺序一次性构建结果，生成连续的NUM编号
+        df = pd.DataFrame({
+            'NUM': np.arange(1, len(df) + 1),
+            'lot_ID': df['lot_ID'].array,
+            'RG(R)': df['RG(R)'].array,
+        })
         
         cleaned_count = len(df)
         if original_count != cleaned_count:
@@ -266,8 +310,10 @@ class RGCleaner:
         filename = generate_lot_based_filename(lot_ids, "RG")
         output_file = self.output_dir / filename
         
-        # 保存到Excel文件 - 使用xlsxwriter引擎提升写入速度
-        df.to_excel(output_file, index=False, engine='xlsxwriter')
+        # 保存到Excel文件 - xlsxwriter常量内存模式逐行流式写入
+        if not write_excel_streaming(df, output_file):
+            self.logger.error(f"保存RG数据失败: {output_file}")
+            return None
         
         self.logger.info(f"RG数据已保存到: {output_file}")
         self.logger.info(f"文件包含 {len(df)} 条RG数据")
@@ -277,6 +323,7 @@ class RGCleaner:
     def run(self):
         """运行RG数据清洗流程"""
         self.logger.info("开始RG数据清洗流程")
+        get_performance_stats().reset()
         
         try:
             # 1. 扫描RG文件
@@ -287,6 +334,9 @@ class RGCleaner:
             
             # 2. 合并所有RG数据
             merged_data = self.merge_all_rg_data(xlsx_files)
+            if self.is_cancelled():
+                self.logger.warning("RG数据清洗已取消")
+                return None
             if merged_data.empty:
                 self.logger.warning("未提取到有效的RG数据，清洗流程结束")
                 return None
@@ -295,6 +345,9 @@ class RGCleaner:
             cleaned_data = self.clean_and_format_rg(merged_data)
             
             # 4. 保存结果
+            if self.is_cancelled():
+                self.logger.warning("RG数据清洗已取消")
+                return None
             output_file = self.save_rg_result(cleaned_data)
             
             self.logger.info("RG数据清洗流程完成")
@@ -305,6 +358,9 @@ class RGCleaner:
             import traceback
             traceback.print_exc()
             return None
+        finally:
+            # 汇总本次处理的读写耗时（含并行工作进程交回的统计）
+            get_performance_stats().log_summary(self.logger)
 
 def main():
     """主函数"""
@@ -313,7 +369,7 @@ def main():
     print("=" * 60)
     
     # 创建RG清洗器
-    cleaner = RGCleaner()
+    cleaner = RGCleaner(cache_dir="../output/_cache")
     
     # 运行清洗流程
     result = cleaner.run()